@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Array-backed grid of a fluidic processor, for large programmable arrays
+
+The processor is represented by boolean masks (walls, valves, blocked and open
+nodes) and by one mask per direction telling from which nodes a fluid can move
+in that direction, following the same rules as SquareGrid.neighbors().
+Distance fields from every reservoir are computed at once with a vectorized
+breadth first search, so the planner reads distances from arrays instead of
+calling heuristic() for each valve.
+
+numpy is only needed when this module is used:
+    pip install numpy
+
+"""
+#import the necessary libraries
+from collections import OrderedDict
+from fluidic_planner import select_whos_closer as fluidic_select_whos_closer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#distance given to the nodes that cannot be reached
+UNREACHABLE = 2**31 - 1
+
+#(dx, dy) of the four directions of the grid
+DIRECTIONS = ((1, 0), (0, -1), (-1, 0), (0, 1))
+
+
+def _shift(array, dx, dy):
+    '''Moves the values of the last two axes of an array by (dx, dy), filling with False'''
+    out = np.zeros_like(array)
+    width, height = array.shape[-2:]
+    out[..., max(dx, 0):width + min(dx, 0), max(dy, 0):height + min(dy, 0)] = \
+        array[..., max(-dx, 0):width + min(-dx, 0), max(-dy, 0):height + min(-dy, 0)]
+    return out
+
+
+#Class that holds the masks of a processor
+class ArrayGrid:
+    def __init__(self, my_processor, max_fields=64):
+        if np is None:
+            raise ImportError('The array-backed grid needs numpy (pip install numpy)')
+
+        model = my_processor.model
+        self.model = model
+        self.shape = (model.width, model.height)
+        self.x, self.y = np.indices(self.shape)
+
+        self.walls = self.mask(model.walls)
+        self.valves = self.mask(model.valve_cells)
+        self.perimeter = self.mask(model.perimeter_cells)
+
+        #moves[d][x, y] is True when the fluid can go from (x, y) to its neighbor in the direction d
+        self.moves = np.zeros((len(DIRECTIONS),) + self.shape, dtype=bool)
+        for (x, y), neighbors in model.adjacent.items():
+            for (nx, ny) in neighbors:
+                self.moves[DIRECTIONS.index((nx - x, ny - y)), x, y] = True
+
+        self.reservoir_names = list(model.reservoirs)
+        self.max_fields = max_fields
+        self._fields = OrderedDict()
+
+    def mask(self, nodes):
+        '''Returns a boolean array that is True in the given nodes'''
+        array = np.zeros(self.shape, dtype=bool)
+        nodes = list(nodes)
+        if nodes:
+            xs, ys = zip(*nodes)
+            array[list(xs), list(ys)] = True
+        return array
+
+    def passable(self, my_processor):
+        '''Nodes that can be used with the current blocked valves'''
+        return ~self.walls & ~self.mask(my_processor.blocked_valves) & ~self.mask(my_processor.blocked_perimeter)
+
+    def manhattan(self, node):
+        '''Field with the distance calculated by heuristic() from every node to a node'''
+        (x, y) = node
+        return np.abs(self.x - x) + np.abs(self.y - y)
+
+    def distance_fields(self, sources, passable):
+        '''Breadth first search from all the sources at once; returns an array
+        (source, x, y) with the number of steps from each source to each node'''
+        count = len(sources)
+        distance = np.full((count,) + self.shape, UNREACHABLE, dtype=np.int32)
+        frontier = np.zeros((count,) + self.shape, dtype=bool)
+        for i, (x, y) in enumerate(sources):
+            frontier[i, x, y] = True
+        visited = frontier.copy()
+        distance[frontier] = 0
+
+        step = 0
+        while frontier.any():
+            step += 1
+            reached = np.zeros_like(frontier)
+            for d, (dx, dy) in enumerate(DIRECTIONS):
+                reached |= _shift(frontier & self.moves[d], dx, dy)
+            frontier = reached & passable & ~visited
+            visited |= frontier
+            distance[frontier] = step
+
+        return distance
+
+    def reservoir_fields(self, my_processor):
+        '''Distance fields from every reservoir, kept while the blocked valves do not change'''
+        key = (my_processor.blocked_valves_mask, my_processor.blocked_perimeter_mask)
+        fields = self._fields.get(key)
+        if fields is None:
+            sources = [self.model.reservoirs[name] for name in self.reservoir_names]
+            fields = self.distance_fields(sources, self.passable(my_processor))
+            self._fields[key] = fields
+            while len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+        self._fields.move_to_end(key)
+        return fields
+
+    def field_to(self, reservoir, my_processor, metric='manhattan'):
+        '''Distance from every node to a reservoir: manhattan, as heuristic(),
+        or fluidic, counting the steps of the shortest path in the processor'''
+        if metric == 'manhattan':
+            return self.manhattan(self.model.reservoirs[reservoir])
+        elif metric == 'fluidic':
+            return self.reservoir_fields(my_processor)[self.reservoir_names.index(reservoir)]
+        raise ValueError('Unknown metric %r' % metric)
+
+
+def select_whos_closer(available, to_goal, grid, my_processor, all_steps, stop_valve_input):
+    '''From a list of available valves, returns the valve that is closer to the goal,
+    reading the distances from a field of the array-backed grid'''
+    if len(available) != 0:
+        xs, ys = zip(*available)
+        distances = to_goal[list(xs), list(ys)]
+        return available[int(np.argmin(distances))]
+
+    #jumps to the free valve that is closer to the input; it is chosen as the dictionary grid
+    #does, so the ties are broken in the same order and the routines are the same
+    return fluidic_select_whos_closer([], stop_valve_input, my_processor, all_steps, stop_valve_input)
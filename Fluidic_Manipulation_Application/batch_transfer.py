@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Plans many routines in one run, without the graphical interface
+
+Each line of the specification file describes one routine, with the same fields
+used in the Routine tab of the application, separated by |
+    File Name | Inputs | Output | Avoid | Wait time (ms) | Sequence description
+for example
+    mix_1 | A:2, B:1 | E | 5, 8 | 300 | mixing A and B
+Only the first three fields are required. Empty lines and lines starting with #
+are ignored.
+
+With --merge NAME, the routines are also scheduled together (scheduler.py):
+the transfers that do not share valves run in the same steps, and the merged
+routine is saved as NAME.
+
+usage: python batch_transfer.py specs.txt --chip Processor_info --out Routines
+
+"""
+#import the necessary libraries
+import argparse
+import os
+import sys
+import time
+from fluidic_planner import Planner, PlanningError, parse_inputs, parse_avoid, write_routine
+from catalogue import Catalogue
+from routines import read_routine
+from scheduler import Scheduler
+
+
+def parse_spec(line):
+    '''Separates one specification line into (name, inputs, output, avoid, wait, description)'''
+    fields = [field.strip() for field in line.split('|')]
+    if len(fields) < 3:
+        raise PlanningError('Expected at least File Name | Inputs | Output')
+    fields.extend([''] * (6 - len(fields)))
+
+    name, inputs, output, avoid_valves, wait, description = fields[:6]
+    try:
+        wait = int(wait or 300)
+    except ValueError:
+        raise PlanningError('The wait time should be a number of ms')
+
+    return name or 'No_name_routine', parse_inputs(inputs), output.upper(), parse_avoid(avoid_valves), wait, description
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plans the routines described in a specification file')
+    parser.add_argument('specs', help='file with one routine per line (use - for stdin)')
+    parser.add_argument('--chip', default='Processor_info', help='folder with the processor information')
+    parser.add_argument('--out', default='Routines', help='folder where the routines are saved')
+    parser.add_argument('--dry-run', action='store_true', help='plans the routines without saving them')
+    parser.add_argument('--search', default='dijkstra', choices=['dijkstra', 'astar', 'bidirectional'], help='search used for the paths between valves')
+    parser.add_argument('--metrics', help='JSON lines file where the time of each phase of the planning is appended')
+    parser.add_argument('--prometheus', help='Prometheus text file where the time of each phase of the planning is written')
+    parser.add_argument('--trace', help='JSON lines file with the time of each phase of every routine')
+    parser.add_argument('--label', action='append', default=[], metavar='KEY=VALUE', help='label added to the metrics, for example version=1.2')
+    parser.add_argument('--merge', help='also saves the routines scheduled together as a single routine with this name')
+    args = parser.parse_args(argv)
+
+    planner = Planner(args.chip, search=args.search)
+    planner.metrics.trace = args.trace is not None
+    for label in args.label:
+        key, _, value = label.partition('=')
+        planner.metrics.labels[key] = value
+    catalogue = None
+    if not args.dry_run:
+        os.makedirs(args.out, exist_ok=True)
+        catalogue = Catalogue(args.out, '.py', read_routine)
+
+    if args.specs == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(args.specs, 'r') as inf:
+            lines = inf.readlines()
+
+    planned = 0
+    failed = 0
+    plans = []
+    start = time.perf_counter()
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line == '' or line.startswith('#'):
+            continue
+
+        try:
+            name, inputs, output, avoid_valves, wait, description = parse_spec(line)
+            plan = planner.transfer(inputs, output, avoid_valves, wait)
+        except PlanningError as error:
+            failed += 1
+            print('line %i: %s' % (number, error), file=sys.stderr)
+            continue
+
+        if not args.dry_run:
+            write_routine(plan, args.out, name, description, catalogue, planner.processor.model.digest, planner.metrics)
+        if args.merge:
+            plans.append(plan)
+        planned += 1
+
+    elapsed = time.perf_counter() - start
+    rate = planned / elapsed if elapsed > 0 else 0.0
+    print('%i routines planned, %i failed in %.3f s (%.0f routines/s)' % (planned, failed, elapsed, rate))
+    print('path cache: %(hits)i hits, %(misses)i misses, %(evictions)i evictions' % planner.paths.info())
+
+    if args.merge and plans:
+        schedule = Scheduler(planner.processor.model).schedule(plans)
+        print('merged: %i steps, %.1f s instead of %.1f s one after another (%.2fx)'
+              % (len(schedule.steps), schedule.makespan / 1000, schedule.serial / 1000, schedule.speedup))
+        if not args.dry_run:
+            write_routine(schedule.plan(), args.out, args.merge, 'transfers scheduled together', catalogue, planner.processor.model.digest)
+    if args.metrics:
+        planner.metrics.export_jsonl(args.metrics)
+    if args.prometheus:
+        planner.metrics.export_prometheus(args.prometheus)
+    if args.trace:
+        planner.metrics.export_trace(args.trace)
+    if catalogue is not None:
+        catalogue.close()
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
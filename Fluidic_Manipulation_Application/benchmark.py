@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the planner, the method assembly and the execution of methods
+
+For each size, a synthetic processor with N x N valves is generated and the
+following phases are measured:
+    plan      Planner.transfer() with random inputs, outputs and avoided valves
+    search    search between random valves (search.py), without the path cache
+    assemble  assemble_method() of routines saved by the planner
+    cached    assemble_method() of the same routines, with a RoutineCache already filled
+    execute   MethodExecutor running the assembled method in a mocked board, without
+              waiting (in the thread of the benchmark), writing each pin
+    batched   the same, in batched mode, writing each port of 8 pins once
+    par-exec  execute and batched, with the methods optimized with the valves that
+    par-batch do not affect each other switched together (optimizer.py)
+    cold      a new Python process that imports the planner and loads the processor
+              from its text files
+    warm      the same, with the processor already in its cache
+The latency percentiles (ms) and the peak memory (KiB) of each phase are reported,
+the mean number of nodes expanded by each search and, for the execution, the
+writes sent to the board for each step of the methods (the valves switched
+together before a wait). With --max-start-ms, the benchmark fails (exit code 1)
+when the median warm start of a size is slower.
+
+usage: python benchmark.py --sizes 2 4 8 16 32 --repeat 200 --json results.json
+
+"""
+#import the necessary libraries
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from fluidic_planner import Planner, cache_path, PlanningError, write_routine
+from search import SEARCHES
+from incremental import predecessors
+from routines import RoutineCache, assemble_method
+from execution import MethodExecutor, coalesce
+from optimizer import optimize
+from synthetic_chip import generate_chip
+
+#program run by the processes of the start phases: folder of the application, folder of the processor
+STARTUP = 'import sys; sys.path.insert(0, sys.argv[1]); from fluidic_planner import Planner; Planner(sys.argv[2])'
+
+
+#Board that accepts the writes of MethodExecutor without a serial port and counts them
+#As in pyfirmata, the pins are grouped in ports of 8, so the batched mode writes whole ports
+class MockPort:
+    def __init__(self, board):
+        self.board = board
+
+    def write(self):
+        self.board.writes += 1
+
+class MockPin:
+    def __init__(self, board, port):
+        self.board = board
+        self.port = port
+        self.value = 0
+
+    def write(self, value):
+        self.value = value
+        self.board.writes += 1
+
+class MockBoard:
+    def __init__(self):
+        self.digital = {}
+        self.ports = {}
+        #writes sent to the board, by pin or by port
+        self.writes = 0
+
+    def pin(self, number):
+        if number not in self.digital:
+            port = self.ports.setdefault(number // 8, MockPort(self))
+            self.digital[number] = MockPin(self, port)
+        return self.digital[number]
+
+    def exit(self):
+        pass
+
+#BoardConnection that gives the mocked board
+class MockConnection:
+    def __init__(self, board):
+        self.board = board
+
+    def connect(self):
+        return self.board
+
+    def is_alive(self):
+        return True
+
+    def invalidate(self):
+        pass
+
+def mock_board(pins):
+    '''Returns a mocked board with all the pins of a processor'''
+    board = MockBoard()
+    for number in pins.values():
+        board.pin(number)
+    return board
+
+
+def execute_method(commands, pins, board, batched=False):
+    '''Runs a method as the application does, with MethodExecutor, but in the calling
+    thread and without waiting'''
+    executor = MethodExecutor(commands, pins, MockConnection(board), log=None, batched=batched, sleep=lambda seconds: None)
+    executor.run()
+    event = executor.events.queue[-1]
+    if event[0] != 'finished':
+        raise RuntimeError('The method stopped at step %i: %s' % (event[1], event[3]))
+    return executor
+
+
+def percentile(values, q):
+    '''Nearest-rank percentile of a list of values'''
+    ordered = sorted(values)
+    if not ordered:
+        return float('nan')
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def random_specs(planner, count, seed=0):
+    '''Random transfers (inputs, output, avoid) for a processor'''
+    rnd = random.Random(seed)
+    model = planner.processor.model
+    reservoirs = list(model.reservoirs)
+    valves = list(model.valves_positioning)
+    specs = []
+    for _ in range(count):
+        k = rnd.randint(1, 3)
+        picks = rnd.sample(reservoirs, k + 1)
+        largest = max(1, len(valves) // (4 * k))
+        inputs = {name: rnd.randint(1, largest) for name in picks[1:]}
+        avoid_valves = rnd.sample(valves, rnd.randint(0, max(0, len(valves) // 16)))
+        specs.append((inputs, picks[0], avoid_valves))
+    return specs
+
+
+def measure(function, items):
+    '''Calls a function for each item; returns the latencies (ms) and the number of failures'''
+    latencies = []
+    failures = 0
+    for item in items:
+        start = time.perf_counter()
+        try:
+            function(item)
+        except PlanningError:
+            failures += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, failures
+
+
+def peak_memory(function, items):
+    '''Peak memory (KiB) allocated while calling a function for each item'''
+    tracemalloc.start()
+    try:
+        for item in items:
+            try:
+                function(item)
+            except PlanningError:
+                pass
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def start_process(chip, cache=True):
+    '''Time (ms) of a new process that loads a processor, with or without its cache'''
+    if not cache and os.path.exists(cache_path(chip)):
+        os.remove(cache_path(chip))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', STARTUP, os.path.dirname(os.path.abspath(__file__)), chip], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def summary(phase, latencies, failures, memory):
+    return {'phase': phase, 'count': len(latencies), 'failures': failures,
+            'p50_ms': percentile(latencies, 50), 'p90_ms': percentile(latencies, 90),
+            'p99_ms': percentile(latencies, 99), 'max_ms': max(latencies) if latencies else float('nan'),
+            'peak_kib': memory}
+
+
+def benchmark_size(n, repeat, folder, grid='dict', search='dijkstra', starts=10):
+    '''Runs all the phases in a processor with n x n valves'''
+    chip = generate_chip(n, os.path.join(folder, 'Processor_info_%ix%i' % (n, n)))
+    planner = Planner(chip, grid=grid, search=search)
+    specs = random_specs(planner, repeat)
+    results = []
+
+    #planning
+    plan = lambda spec: planner.transfer(spec[0], spec[1], spec[2], 300)
+    latencies, failures = measure(plan, specs)
+    results.append(summary('plan', latencies, failures, peak_memory(plan, specs[:50])))
+    results[-1]['expanded'] = planner.expanded / len(specs) if specs else 0.0
+
+    #path finding, without the cache
+    rnd = random.Random(1)
+    cells = list(planner.processor.model.valve_cells)
+    pairs = [tuple(rnd.sample(cells, 2)) for _ in range(repeat)]
+    planner.refresh()
+    expanded = []
+    #the bidirectional search gets the predecessors of the nodes once per processor, as the Planner does
+    options = {}
+    if search == 'bidirectional':
+        options['previous'] = predecessors(planner.processor.model)
+    find_path = lambda pair: expanded.append(SEARCHES[search](planner.processor, pair[0], pair[1], **options)[1])
+    latencies, failures = measure(find_path, pairs)
+    results.append(summary('search', latencies, failures, peak_memory(find_path, pairs[:50])))
+    results[-1]['expanded'] = sum(expanded[:len(pairs)]) / len(pairs) if pairs else 0.0
+
+    #method assembly from the routines saved by the planner
+    routines_folder = os.path.join(folder, 'Routines_%i' % n)
+    os.makedirs(routines_folder, exist_ok=True)
+    paths = []
+    for i, spec in enumerate(specs):
+        try:
+            paths.append(write_routine(plan(spec), routines_folder, 'routine_%i' % i)[0])
+        except PlanningError:
+            pass
+    methods = [paths[i:i + 10] for i in range(0, len(paths), 10)] or [[]]
+    latencies, failures = measure(assemble_method, methods)
+    results.append(summary('assemble', latencies, failures, peak_memory(assemble_method, methods)))
+
+    cache = RoutineCache()
+    assemble_cached = lambda paths: assemble_method(paths, cache)
+    for paths in methods:
+        assemble_cached(paths)
+    latencies, failures = measure(assemble_cached, methods)
+    results.append(summary('cached', latencies, failures, peak_memory(assemble_cached, methods)))
+
+    #execution in a mocked board
+    board = mock_board(planner.pins)
+    method_lists = [assemble_method(paths) for paths in methods]
+    #each command of a routine has its own wait, so the methods are also run with the
+    #independent valves switched together (optimizer.py), where the ports are written once
+    parallel_lists = [optimize(lists, planner.processor, parallel=True) for lists in method_lists]
+    for phase, batched, methods_run in (('execute', False, method_lists), ('batched', True, method_lists),
+                                        ('par-exec', False, parallel_lists), ('par-batch', True, parallel_lists)):
+        #steps of the methods: the valves switched together before a wait
+        steps = sum(kind == 'set' for lists in methods_run for kind, value, commands in coalesce(lists, planner.pins))
+        execute = lambda commands: execute_method(commands, planner.pins, board, batched)
+        board.writes = 0
+        latencies, failures = measure(execute, methods_run)
+        writes = board.writes
+        results.append(summary(phase, latencies, failures, peak_memory(execute, methods_run)))
+        results[-1]['writes_per_step'] = writes / steps if steps else 0.0
+
+    #start of a new process, without and with the cache of the processor
+    for phase, cache in (('cold', False), ('warm', True)):
+        if starts:
+            start_process(chip, cache)
+            latencies = [start_process(chip, cache) for _ in range(starts)]
+            results.append(summary(phase, latencies, 0, float('nan')))
+
+    for result in results:
+        result.update({'size': n, 'valves': n * n, 'grid': grid, 'search': search})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the planner in synthetic processors')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2, 4, 8, 16, 32], help='valves in each side of the processors')
+    parser.add_argument('--repeat', type=int, default=200, help='number of measurements of each phase')
+    parser.add_argument('--grid', default='dict', choices=['dict', 'array'], help='grid used by the planner')
+    parser.add_argument('--search', default='dijkstra', choices=sorted(SEARCHES), help='search used for the paths between valves')
+    parser.add_argument('--starts', type=int, default=10, help='number of processes started to measure the start (0 to skip it)')
+    parser.add_argument('--max-start-ms', type=float, help='fails if the median warm start of a size is slower (ms)')
+    parser.add_argument('--json', help='file where the results are saved')
+    args = parser.parse_args(argv)
+
+    results = []
+    header = '%6s %9s %6s %6s %10s %10s %10s %10s %10s %10s %11s' % ('size', 'phase', 'count', 'fail', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'peak KiB', 'expanded', 'writes/step')
+    print(header)
+    with tempfile.TemporaryDirectory() as folder:
+        for n in args.sizes:
+            for result in benchmark_size(n, args.repeat, folder, args.grid, args.search, args.starts):
+                results.append(result)
+                print('%6s %9s %6i %6i %10.3f %10.3f %10.3f %10.3f %10.1f %10s %11s' % (
+                    '%ix%i' % (n, n), result['phase'], result['count'], result['failures'],
+                    result['p50_ms'], result['p90_ms'], result['p99_ms'], result['max_ms'], result['peak_kib'],
+                    '%.1f' % result['expanded'] if 'expanded' in result else '',
+                    '%.2f' % result['writes_per_step'] if 'writes_per_step' in result else ''))
+            sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(results, out, indent=1)
+
+    if args.max_start_ms is not None:
+        slow = [result for result in results if result['phase'] == 'warm' and result['p50_ms'] > args.max_start_ms]
+        for result in slow:
+            print('%ix%i: warm start %.1f ms, slower than %.1f ms' % (result['size'], result['size'], result['p50_ms'], args.max_start_ms))
+        if slow:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
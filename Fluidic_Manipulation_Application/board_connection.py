@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Long-lived connection to the Arduino board
+
+Opening a pyfirmata connection resets the board and waits for Firmata to start,
+which takes seconds, so the connection is opened once and reused by all the
+methods. Before each method the connection is checked and, if the board was
+unplugged or the serial port failed, it is opened again, waiting longer after
+each failed attempt. When the board cannot be reached a BoardConnectionError
+is raised instead of running the method without the board.
+
+The port is read from port.txt in the Processor_info folder (for example COM3 or
+/dev/ttyACM0), from the FLUIDIC_BOARD_PORT environment variable or, if none of
+them is set, it is COM3.
+
+"""
+#import the necessary libraries
+import os
+import threading
+import time
+
+DEFAULT_PORT = 'COM3'
+
+
+#Error raised when the board cannot be used
+class BoardConnectionError(Exception):
+    pass
+
+
+def load_port(folder=None, default=DEFAULT_PORT):
+    '''Returns the serial port of the board of a processor'''
+    if folder is not None:
+        path = os.path.join(folder, 'port.txt')
+        if os.path.exists(path):
+            with open(path, 'r') as inf:
+                port = inf.read().strip().strip('\'"')
+            if port != '':
+                return port
+    return os.environ.get('FLUIDIC_BOARD_PORT', default)
+
+
+def arduino_mega(port):
+    '''Opens a pyfirmata connection to an Arduino Mega'''
+    import pyfirmata
+    return pyfirmata.ArduinoMega(port)
+
+
+#Class that keeps the board connected between methods
+class BoardConnection:
+    def __init__(self, port=DEFAULT_PORT, factory=arduino_mega, retries=3, backoff=1.0, max_backoff=10.0, sleep=time.sleep):
+        self.port = port
+        #function that opens the connection to the board in a port
+        self.factory = factory
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.board = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def is_alive(self):
+        '''Checks if the serial port of the board is still open and answering'''
+        board = self.board
+        if board is None:
+            return False
+        serial_port = getattr(board, 'sp', None)
+        if serial_port is None:
+            return True
+        try:
+            serial_port.in_waiting
+            return bool(serial_port.is_open)
+        except Exception as error:
+            self.last_error = error
+            return False
+
+    def connect(self):
+        '''Returns the board, connecting (again) if needed'''
+        with self._lock:
+            if self.is_alive():
+                return self.board
+            self._close()
+
+            delay = self.backoff
+            for attempt in range(1, self.retries + 1):
+                try:
+                    self.board = self.factory(self.port)
+                    self.last_error = None
+                    return self.board
+                except Exception as error:
+                    self.last_error = error
+                    if attempt < self.retries:
+                        self.sleep(delay)
+                        delay = min(delay * 2, self.max_backoff)
+
+            raise BoardConnectionError('Could not connect to the board in %s after %i attempts: %s'
+                                       % (self.port, self.retries, self.last_error))
+
+    def invalidate(self):
+        '''Marks the connection as broken, so the next method connects again'''
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self.board is not None:
+            try:
+                self.board.exit()
+            except Exception:
+                pass
+        self.board = None
+
+    def close(self):
+        '''Closes the connection to the board'''
+        with self._lock:
+            self._close()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Catalogue of the routines and methods saved in a folder
+
+The routines (.py) and the methods (.txt) are indexed in a SQLite database
+(.catalogue.sqlite) kept in their folder, with the processor, inputs, output,
+number of valves and duration of each one. The catalogue gives:
+    - the free name for a new file, without listing the folder: if the name is
+      taken, the next number is read from the database (name(1), name(2)...)
+    - the list of files, filtered by processor, input, output or name, without
+      reading the folder
+The folder is only listed again when its modification time changes, that is,
+when files were added or removed by other programs. The database can be
+deleted at any time; it is built again from the files in the folder.
+
+"""
+#import the necessary libraries
+import os
+import sqlite3
+import time
+
+DATABASE = '.catalogue.sqlite'
+
+
+def summarize(commands):
+    '''Returns the number of valves and the duration (ms) of a list of commands (o1, w300, c1...)'''
+    valves = set()
+    duration = 0
+    for item in commands:
+        kind = item[:1]
+        if kind == 'o' or kind == 'c':
+            valves.add(item[1:])
+        elif kind == 'w' and item[1:].isdigit():
+            duration += int(item[1:])
+    return len(valves), duration
+
+
+def inputs_text(inputs):
+    '''Writes the inputs of a routine ({'A': 1, 'B': 2}) as ",A,B," so they can be filtered one by one'''
+    if not inputs:
+        return None
+    return ',' + ','.join(str(name) for name in inputs) + ','
+
+
+#Catalogue of the files with one extension in a folder
+#read_commands(path) returns the commands of a file, to index files saved by other programs
+class Catalogue:
+    def __init__(self, folder, extension, read_commands=None, database=DATABASE):
+        self.folder = folder
+        self.extension = extension
+        self.read_commands = read_commands
+        os.makedirs(folder, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(folder, database))
+        #the journal file is kept, so writing the database does not change the folder;
+        #the database is not flushed to the disk after each file, since it can be built again
+        self._db.execute('PRAGMA journal_mode=PERSIST')
+        self._db.execute('PRAGMA synchronous=OFF')
+        with self._db:
+            self._db.execute('''CREATE TABLE IF NOT EXISTS files (
+                name TEXT PRIMARY KEY, file TEXT, chip TEXT, inputs TEXT, output TEXT,
+                valves INTEGER, duration INTEGER, description TEXT, created REAL)''')
+            self._db.execute('CREATE INDEX IF NOT EXISTS files_output ON files (output)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS files_chip ON files (chip)')
+            #next number used for each name that was already taken
+            self._db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, next INTEGER)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER)')
+        self.sync()
+
+    def close(self):
+        self._db.close()
+
+    def _folder_version(self):
+        return os.stat(self.folder).st_mtime_ns
+
+    def _remember_folder(self):
+        self._db.execute('INSERT OR REPLACE INTO state VALUES (?, ?)', ('folder_mtime', self._folder_version()))
+
+    def sync(self):
+        '''Indexes the files added or removed by other programs; returns the number of changes'''
+        row = self._db.execute('SELECT value FROM state WHERE key = ?', ('folder_mtime',)).fetchone()
+        if row is not None and row[0] == self._folder_version():
+            return 0
+
+        in_folder = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(self.extension):
+                    in_folder[entry.name[:-len(self.extension)]] = entry
+        indexed = {name for (name,) in self._db.execute('SELECT name FROM files')}
+
+        removed = indexed - set(in_folder)
+        added = [in_folder[name] for name in in_folder if name not in indexed]
+        with self._db:
+            self._db.executemany('DELETE FROM files WHERE name = ?', [(name,) for name in removed])
+            for entry in added:
+                valves = duration = None
+                if self.read_commands is not None:
+                    try:
+                        valves, duration = summarize(self.read_commands(entry.path))
+                    except (OSError, IndexError, ValueError):
+                        pass
+                self._db.execute('INSERT INTO files (name, file, valves, duration, created) VALUES (?, ?, ?, ?, ?)',
+                                 (entry.name[:-len(self.extension)], entry.name, valves, duration, entry.stat().st_mtime))
+            self._remember_folder()
+        return len(removed) + len(added)
+
+    def _taken(self, name):
+        if self._db.execute('SELECT 1 FROM files WHERE name = ?', (name,)).fetchone() is not None:
+            return True
+        return os.path.exists(os.path.join(self.folder, name + self.extension))
+
+    def allocate(self, name):
+        '''Returns a free name: the name itself or name(i), with the next i of that name'''
+        name = str(name)
+        self.sync()
+        if not self._taken(name):
+            return name
+
+        row = self._db.execute('SELECT next FROM counters WHERE name = ?', (name,)).fetchone()
+        i = row[0] if row is not None else 1
+        while self._taken(name + '(' + str(i) + ')'):
+            i = i + 1
+        with self._db:
+            self._db.execute('INSERT OR REPLACE INTO counters VALUES (?, ?)', (name, i + 1))
+        return name + '(' + str(i) + ')'
+
+    def add(self, name, commands=None, chip=None, inputs=None, output=None, description=None):
+        '''Indexes a file that was just written in the folder'''
+        valves, duration = summarize(commands) if commands is not None else (None, None)
+        with self._db:
+            self._db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (name, name + self.extension, chip, inputs_text(inputs), output,
+                              valves, duration, description, time.time()))
+            self._remember_folder()
+
+    def remove(self, name):
+        '''Deletes a file and its entry'''
+        path = os.path.join(self.folder, name + self.extension)
+        if os.path.exists(path):
+            os.remove(path)
+        with self._db:
+            self._db.execute('DELETE FROM files WHERE name = ?', (name,))
+            self._remember_folder()
+
+    def files(self, chip=None, input=None, output=None, contains=None, limit=None):
+        '''Returns the file names (with extension), sorted, filtered by processor,
+        by one of the inputs, by output and by a part of the name'''
+        self.sync()
+        query = 'SELECT file FROM files'
+        conditions = []
+        values = []
+        if chip is not None:
+            conditions.append('chip = ?')
+            values.append(chip)
+        if input is not None:
+            #the input is matched as a whole name, without the wildcards of LIKE
+            conditions.append('instr(inputs, ?) > 0')
+            values.append(',' + str(input) + ',')
+        if output is not None:
+            conditions.append('output = ?')
+            values.append(output)
+        if contains is not None:
+            conditions.append('instr(name, ?) > 0')
+            values.append(contains)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY name'
+        if limit is not None:
+            query += ' LIMIT %i' % limit
+        return [file for (file,) in self._db.execute(query, values)]
+
+    def info(self, name):
+        '''Returns the metadata of a file as a dictionary, or None'''
+        cursor = self._db.execute('SELECT * FROM files WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
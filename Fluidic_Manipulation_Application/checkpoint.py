@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Checkpoints of the methods that run in the board
+
+While a method runs, MethodExecutor saves in a checkpoint file, every few
+seconds and when the method is paused, aborted or stopped by an error:
+    {"method": ".../mix.txt", "compiled": false, "size": ..., "mtime_ns": ...,
+     "step": 1520, "total": 90000, "valves": [[22, 1], [23, 0], ...],
+     "state": "running", "time": ...}
+that is, how many commands of the method were done and the state of every pin
+at that command (when the method is aborted or stopped by an error the valves
+are then closed, but the checkpoint keeps the state they had in the method).
+The file is written to a temporary file and renamed, so a crash leaves either the
+previous checkpoint or the new one. When the method finishes, the checkpoint is
+deleted.
+
+resume_executor() continues a method from its checkpoint: the valves are set as
+they were, and the method goes on from the next command (a wait that was
+running when the computer stopped is waited again from its start). The method
+file must not have changed since the checkpoint was saved.
+
+usage: python checkpoint.py Routines/Methods/mix.checkpoint (prints the state saved)
+
+"""
+#import the necessary libraries
+import json
+import os
+import sys
+import time
+
+#time between checkpoints (s)
+EVERY = 5.0
+
+
+#Error raised when a method cannot continue from a checkpoint
+class CheckpointError(Exception):
+    pass
+
+
+def checkpoint_path(path):
+    '''Path of the checkpoint of a method file'''
+    return os.path.splitext(path)[0] + '.checkpoint'
+
+
+#Checkpoint file of a method
+class Checkpoint:
+    def __init__(self, path, method, compiled=False, every=EVERY):
+        self.path = path
+        #method file that is running and whether it is the compiled copy
+        self.method = os.path.abspath(method)
+        self.compiled = compiled
+        self.every = every
+        stat = os.stat(self.method)
+        self.stamp = (stat.st_size, stat.st_mtime_ns)
+        self.saved = None
+        self.writes = 0
+
+    def due(self):
+        '''True when the last checkpoint is older than every seconds'''
+        return self.saved is None or time.monotonic() - self.saved >= self.every
+
+    def save(self, step, total, valves, state='running'):
+        '''Writes the number of commands done and the state of the pins {pin: 1 or 0}'''
+        data = {'method': self.method, 'compiled': self.compiled, 'size': self.stamp[0], 'mtime_ns': self.stamp[1],
+                'step': step, 'total': total, 'valves': sorted([pin, value] for pin, value in valves.items() if pin is not None),
+                'state': state, 'time': time.time()}
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as out:
+            json.dump(data, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temporary, self.path)
+        self.saved = time.monotonic()
+        self.writes += 1
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def load_checkpoint(path):
+    '''Reads a checkpoint file'''
+    try:
+        with open(path, 'r') as inf:
+            data = json.load(inf)
+    except (OSError, ValueError) as error:
+        raise CheckpointError('Could not read the checkpoint %s: %s' % (path, error))
+    for key in ('method', 'compiled', 'size', 'mtime_ns', 'step', 'total', 'valves', 'state'):
+        if key not in data:
+            raise CheckpointError('The checkpoint %s has no %s' % (path, key))
+    return data
+
+
+def resume_executor(path, Python_to_arduino, digest=None, every=EVERY, **options):
+    '''Returns the MethodExecutor that continues the method of a checkpoint; the options
+    are given to MethodExecutor (connection, events, log, batched...)'''
+    from execution import MethodExecutor
+    from method_format import MethodFormatError, load_compiled
+    from routines import TextMethod
+
+    data = load_checkpoint(path)
+    method = data['method']
+    try:
+        stat = os.stat(method)
+    except OSError:
+        raise CheckpointError('The method %s of the checkpoint does not exist' % method)
+    if (stat.st_size, stat.st_mtime_ns) != (data['size'], data['mtime_ns']):
+        raise CheckpointError('The method %s changed after the checkpoint was saved' % method)
+
+    if data['compiled']:
+        try:
+            lists = load_compiled(method, digest)
+        except MethodFormatError as error:
+            raise CheckpointError(str(error))
+    else:
+        lists = TextMethod(method, Python_to_arduino)
+    valves = {pin: value for pin, value in data['valves']}
+    return MethodExecutor(lists, Python_to_arduino, checkpoint=Checkpoint(path, method, data['compiled'], every),
+                          start=data['step'], valves=valves, **options)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print('usage: python checkpoint.py method.checkpoint')
+        return 2
+    try:
+        data = load_checkpoint(argv[0])
+    except CheckpointError as error:
+        print(error)
+        return 1
+    print('method    %s' % data['method'])
+    print('state     %s at %s' % (data['state'], time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data.get('time', 0)))))
+    print('commands  %i of %i done' % (data['step'], data['total']))
+    print('open pins %s' % (', '.join(str(pin) for pin, value in data['valves'] if value) or 'none'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled model of a fluidic processor
+
+It is built once, when the processor is loaded, and holds the indexes used while
+planning: name <-> coordinate maps for every valve and reservoir, integer ids
+for the valves and the neighbors of every node of the grid.
+
+A set of valves is kept by the grid as an integer with one bit per valve id
+(bit i is set when the valve with id i is in the set), so unions, differences
+and membership tests are single operations on an integer.
+
+"""
+
+
+#Class that holds the indexes of a processor
+class ChipModel:
+    def __init__(self, my_processor):
+        self.width = my_processor.width
+        self.height = my_processor.height
+        self.walls = frozenset(my_processor.walls)
+
+        #name -> coordinate, as in the Processor_info folder
+        self.valves_positioning = dict(my_processor.valves_positioning)
+        self.perimeter_valves = dict(my_processor.perimeter_valves)
+        self.reservoirs = dict(my_processor.reservoirs)
+
+        #coordinate -> name; if two names share a node the first one is kept
+        self.valve_at = self._invert(self.valves_positioning)
+        self.perimeter_at = self._invert(self.perimeter_valves)
+        self.reservoir_at = self._invert(self.reservoirs)
+
+        #nodes of the valves of the processor, in the order they were defined
+        self.valve_cells = frozenset(self.valves_positioning.values())
+        self.perimeter_cells = frozenset(self.perimeter_valves.values())
+
+        #integer ids: the valves of the processor first, then the perimeter valves
+        self.names = list(self.valves_positioning) + list(self.perimeter_valves)
+        self.valve_id = {name: i for i, name in enumerate(self.names)}
+        self.positions = [self.position(name) for name in self.names]
+        self.id_at = {}
+        for i, node in enumerate(self.positions):
+            self.id_at.setdefault(node, i)
+
+        #bit of every valve in the masks of valves
+        self.bit_at = {node: 1 << i for node, i in self.id_at.items()}
+        self.valve_mask = self.mask(self.valve_cells)
+        self.perimeter_mask = self.mask(self.perimeter_cells)
+
+        #identifies the processor, so results computed for it can be reused
+        #(hashlib is imported here, since a processor read from the cache is not compiled again)
+        import hashlib
+        definition = (self.width, self.height, sorted(self.walls), sorted(self.valves_positioning.items()),
+                      sorted(self.perimeter_valves.items()), sorted(self.reservoirs.items()))
+        self.digest = hashlib.sha1(repr(definition).encode()).hexdigest()
+
+        #neighbors of every node before any valve is blocked
+        self.adjacent = {}
+        for x in range(self.width):
+            for y in range(self.height):
+                self.adjacent[(x, y)] = tuple(my_processor.neighbors((x, y)))
+        #the same neighbors with their bits (0 for the nodes that are not valves)
+        self.adjacent_bits = {node: tuple((n, self.bit_at.get(n, 0)) for n in neighbors)
+                              for node, neighbors in self.adjacent.items()}
+
+    @staticmethod
+    def _invert(d):
+        inverted = {}
+        for name, node in d.items():
+            inverted.setdefault(node, name)
+        return inverted
+
+    def position(self, name):
+        '''returns the coordinates of a valve or reservoir using its name'''
+        name = str(name)
+        if name in self.reservoirs:
+            return self.reservoirs[name]
+        elif name in self.valves_positioning:
+            return self.valves_positioning[name]
+        elif name in self.perimeter_valves:
+            return self.perimeter_valves[name]
+
+    def mask(self, nodes):
+        '''returns the mask of a set of valves (nodes that are not valves are left out)'''
+        bit_at = self.bit_at
+        mask = 0
+        for node in nodes:
+            mask |= bit_at.get(node, 0)
+        return mask
+
+    def nodes(self, mask):
+        '''returns the nodes of the valves in a mask'''
+        positions = self.positions
+        nodes = []
+        while mask:
+            low = mask & -mask
+            nodes.append(positions[low.bit_length() - 1])
+            mask ^= low
+        return nodes
+
+    def name(self, node):
+        '''returns the name of the valve or reservoir in a node of the grid'''
+        if node in self.valve_at:
+            return self.valve_at[node]
+        elif node in self.perimeter_at:
+            return self.perimeter_at[node]
+        return self.reservoir_at.get(node)
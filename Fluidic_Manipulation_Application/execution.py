@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Execution of methods in the Arduino board
+
+The commands of a method are o<valve> (opens the valve), c<valve> (closes the
+valve) and w<ms> (waits). The valve names are converted into pins of the board
+using the dictionary in Processor_info/Arduino_pins.txt; a method with valves
+that have no pin is not started (PinError).
+
+In batched mode, the opening and closing commands that are not separated by a
+wait are merged into one step, and the pins of each step are sent to the board
+as Firmata digital port messages: one message per port of 8 pins, instead of one
+message per valve, so the valves of a step switch together.
+
+With a Telemetry object (telemetry.py), MethodExecutor also records the planned
+and the actual time of every valve switched. With a Checkpoint (checkpoint.py),
+it saves from time to time the number of commands done and the state of the
+valves, and it can start from a checkpoint: the valves are set as they were
+and the method continues with the next command.
+
+"""
+#import the necessary libraries
+import itertools
+import queue
+import threading
+import time
+
+
+#Error raised when valves of a method have no pin in the board
+class PinError(Exception):
+    pass
+
+
+def parse_actions(lists, Python_to_arduino):
+    '''Converts the commands of a method into actions: ('set', (pin, 1 or 0), command)
+    for the opening / closing commands and ('wait', ms, command) for the waits'''
+    for item in lists:
+        if item.startswith("o") or item.startswith("c"):
+            valve = str(''.join(filter(str.isdigit,item)))
+            pin = Python_to_arduino.get(valve)
+            if pin is None:
+                raise PinError('The valve %s has no pin in the board' % valve)
+            yield ('set', (pin, 1 if item.startswith("o") else 0), item)
+
+        elif item.startswith("w"):
+            yield ('wait', int(''.join(filter(str.isdigit,item))), item)
+
+
+def missing_pins(lists, Python_to_arduino):
+    '''Returns the valves of the opening / closing commands of a method that have no pin'''
+    missing = set()
+    for item in lists:
+        if item.startswith("o") or item.startswith("c"):
+            valve = str(''.join(filter(str.isdigit,item)))
+            if Python_to_arduino.get(valve) is None:
+                missing.add(valve)
+    return sorted(missing, key=lambda valve: (len(valve), valve))
+
+
+def check_pins(lists, Python_to_arduino):
+    '''Raises PinError naming the valves of a method that have no pin in the board;
+    a method file (routines.TextMethod) is read once to check it, and the pins of a
+    compiled method were checked when it was compiled'''
+    if hasattr(lists, 'missing_pins'):
+        missing = lists.missing_pins()
+    elif hasattr(lists, 'steps'):
+        missing = []
+    else:
+        missing = missing_pins(lists, Python_to_arduino)
+    if missing:
+        raise PinError('The valve%s %s of the method %s no pin in the board (Arduino_pins.txt)' % (
+            's' if len(missing) > 1 else '', ', '.join(missing), 'have' if len(missing) > 1 else 'has'))
+
+
+def group_steps(actions, batched=True):
+    '''Groups actions into steps: ['set', {pin: 1 or 0}, commands] and ['wait', ms, commands];
+    in batched mode, the actions that are not separated by a wait make a single step
+    (the last action of a pin wins). The steps are produced as the actions are read'''
+    pending = None
+    for kind, value, text in actions:
+        if kind == 'set':
+            pin, state = value
+            if not batched:
+                yield ['set', {pin: state}, [text]]
+            elif pending is None:
+                pending = ['set', {pin: state}, [text]]
+            else:
+                pending[1].pop(pin, None)
+                pending[1][pin] = state
+                pending[2].append(text)
+        else:
+            if pending is not None:
+                yield pending
+                pending = None
+            yield [kind, value, [text]]
+
+    if pending is not None:
+        yield pending
+
+
+def coalesce(lists, Python_to_arduino, batched=True):
+    '''Returns the list of steps of a method, with the valves converted into pins'''
+    return list(group_steps(parse_actions(lists, Python_to_arduino), batched))
+
+
+def write_valves(board, changes, batched=True):
+    '''Sets the state of several pins; in batched mode, each port of the board
+    is written once with all its pins'''
+    ports = []
+    for number, value in changes.items():
+        pin = board.digital[number]
+        port = getattr(pin, 'port', None)
+        if batched and port is not None:
+            pin.value = value
+            if port not in ports:
+                ports.append(port)
+        else:
+            pin.write(value)
+
+    for port in ports:
+        port.write()
+
+
+#Thread that executes a method without freezing the application
+#The progress is reported in a queue as (event, step, total, command), where event is
+#'started', 'step', 'paused', 'resumed', 'finished', 'aborted' or 'error'
+#The method can be a list of commands, a method file read as it runs (routines.TextMethod)
+#or a compiled method (method_format.py)
+#Without a connection, the method is only logged (dry run); with sleep, the waits of the
+#method call it instead of waiting in the thread (the benchmarks give one that returns at once)
+#A method with valves that have no pin raises PinError before anything is sent to the board
+class MethodExecutor(threading.Thread):
+    def __init__(self, lists, Python_to_arduino, connection=None, events=None, log=print, poll=0.05, batched=False, telemetry=None,
+                 checkpoint=None, start=0, valves=None, sleep=None):
+        super().__init__(daemon=True)
+        check_pins(lists, Python_to_arduino)
+        #merges the commands without a wait between them and writes whole ports
+        self.batched = batched
+        self.Python_to_arduino = Python_to_arduino
+        #BoardConnection that gives the board; it is checked in the thread, since connecting takes seconds
+        self.connection = connection
+        self.events = events if events is not None else queue.Queue()
+        self.log = log
+        self.poll = poll
+        self.sleep = sleep
+        self.board = None
+        self.method = lists
+        #number of commands of the method; the commands before start were already done
+        if hasattr(lists, 'steps'):
+            self.steps = lists.steps(batched, start)
+            self.total = len(lists)
+        else:
+            actions = itertools.islice(parse_actions(lists, Python_to_arduino), start, None)
+            self.steps = list(group_steps(actions, batched))
+            self.total = start + sum(len(commands) for kind, value, commands in self.steps)
+        self.first_step = start
+        self.step = start
+        #state of the pins {pin: 1 or 0}; when starting from a checkpoint, the state it saved
+        self.valves = dict(valves or {})
+        self.restore = valves is not None
+        #Checkpoint where the progress is saved
+        self.checkpoint = checkpoint
+        #Telemetry that records the planned and actual time of each valve switched
+        self.telemetry = telemetry
+        #time spent paused, which delays the planned time of the next steps
+        self.paused_time = 0.0
+        self._running = threading.Event()
+        self._running.set()
+        self._abort = threading.Event()
+
+    def pause(self):
+        '''Holds the valves in their current state until resume() or abort()'''
+        if self._running.is_set() and not self._abort.is_set():
+            self._running.clear()
+            self.events.put(('paused', self.step, self.total, None))
+
+    def resume(self):
+        if not self._running.is_set():
+            self._running.set()
+            self.events.put(('resumed', self.step, self.total, None))
+
+    def abort(self):
+        '''Stops the method and closes all the valves'''
+        self._abort.set()
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def _wait(self, seconds):
+        '''Waits for a time, stopping the clock while paused; returns False if aborted'''
+        if self.sleep is not None and seconds > 0:
+            self.sleep(seconds)
+            seconds = 0
+        end = time.monotonic() + seconds
+        while True:
+            if self._abort.is_set():
+                return False
+            if not self._running.is_set():
+                paused = time.monotonic()
+                self._save('paused')
+                remaining = end - paused
+                self._running.wait()
+                self.paused_time += time.monotonic() - paused
+                end = time.monotonic() + max(remaining, 0)
+                continue
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return True
+            self._abort.wait(min(remaining, self.poll))
+
+    def _write(self, changes):
+        '''Sets the pins and returns the time when the board was written'''
+        if self.board is not None:
+            write_valves(self.board, changes, self.batched)
+        written = time.monotonic()
+        self.valves.update(changes)
+        if self.log is not None:
+            for pin, value in changes.items():
+                self.log('high' if value else 'low', pin)
+        return written
+
+    def close_all(self):
+        '''Closes every valve of the processor'''
+        self._write({pin: 0 for pin in self.Python_to_arduino.values()})
+
+    def _save(self, state):
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.step, self.total, self.valves, state)
+
+    def run(self):
+        total = self.total
+        try:
+            if self.connection is not None:
+                self.board = self.connection.connect()
+            if self.restore:
+                #sets every valve as it was when the checkpoint was saved
+                self._write({pin: self.valves.get(pin, 0) for pin in self.Python_to_arduino.values()})
+            self.events.put(('started', self.first_step, total, None))
+            self._save('running')
+
+            telemetry = self.telemetry
+            start = time.monotonic()
+            if telemetry is not None:
+                telemetry.begin(start)
+            #time of the next step from the start, adding the waits of the method
+            planned = 0.0
+            done = self.first_step
+            for kind, value, commands in self.steps:
+                if not self._wait(0):
+                    break
+
+                if kind == 'set':
+                    written = self._write(value)
+                    if telemetry is not None:
+                        telemetry.record(done, value, start + planned + self.paused_time, written)
+
+                if kind == 'wait':
+                    if self.log is not None:
+                        self.log('wait', value)
+                    planned += value/1000
+                    if not self._wait(value/1000):
+                        break
+
+                done += len(commands)
+                self.step = done
+                self.events.put(('step', done, total, ' '.join(commands)))
+                if self.checkpoint is not None and self.checkpoint.due():
+                    self._save('running')
+
+            if self._abort.is_set():
+                #the checkpoint keeps the state of the valves in the method, before closing them
+                self._save('aborted')
+                self.close_all()
+                self.events.put(('aborted', self.step, total, None))
+            else:
+                if self.checkpoint is not None:
+                    self.checkpoint.remove()
+                self.events.put(('finished', total, total, None))
+
+        except Exception as error:
+            try:
+                self._save('error')
+            except Exception:
+                pass
+            try:
+                self.close_all()
+            except Exception:
+                pass
+            if self.connection is not None and not self.connection.is_alive():
+                self.connection.invalidate()
+            self.events.put(('error', self.step, total, str(error)))
+
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.close()
+            #releases the memory map of a compiled method
+            if hasattr(self.method, 'close'):
+                self.method.close()
@@ -0,0 +1,934 @@
+# -*- coding: utf-8 -*-
+"""
+Headless planning engine of the Fluidic Manipulation Application
+
+It holds the grid that represents the processor, the path finding tools and the
+transfer planner, without any dependency on tkinter, PIL or pyfirmata, so it can
+be imported by scripts and used on machines without a display or a board.
+It uses parts of the Dijkstra algorithm developed by  redblobgames@gmail.com
+
+The compiled grid of a processor and the pins of its board are saved in the
+cache folder of the user (cache_folder()), in a file named by the hash of the
+contents of the files of the processor, and read from it while those files do not
+change, so the text files are not parsed again each time the application or a
+script starts. A cache file that cannot be read is ignored and written again.
+
+"""
+#import the necessary libraries
+import functools
+import heapq
+import os
+import pickle
+import re
+import time
+from chip_model import ChipModel
+from path_cache import PathCache
+from metrics import Metrics
+
+
+#Error raised when a routine cannot be planned in the processor
+class PlanningError(Exception):
+    pass
+
+
+#tools to draw the grid that represents the processor on the screen
+def draw_tile(graph, id, style, width):
+    r = "."
+    if 'number' in style and id in style['number']: r = "%d" % style['number'][id]
+    if 'point_to' in style and style['point_to'].get(id, None) is not None:
+        (x1, y1) = id
+        (x2, y2) = style['point_to'][id]
+    if 'start' in style and id == style['start']: r = "S"
+    elif 'goal' in style and id == style['goal']: r = "G"
+    elif 'path' in style and id in style['path']: r = "@"
+    elif 'path1' in style and id in style['path1']: r = "&"
+    if id in graph.walls: r = "#"
+    elif graph.model is not None and (graph.blocked_valves_mask | graph.blocked_perimeter_mask) & graph.model.bit_at.get(id, 0): r = "X"
+    return r
+
+#draws the grid of the processor on the screen
+def draw_grid(graph, width=3, height = 3, **style):
+    for y in range(graph.height):
+        for x in range(graph.width):
+            print("%%-%ds" % width % draw_tile(graph, (x, y), style, width), end="")
+        print()
+
+#Class to set the rules for the processor
+#The open and blocked valves are kept as masks (one bit per valve id of the model,
+#see chip_model.py); open, blocked_valves and blocked_perimeter give them as sets
+class SquareGrid:
+    __slots__ = ('width', 'height', 'walls', 'perimeter_valves', 'valves_positioning', 'reservoirs', 'model',
+                 'open_mask', 'blocked_valves_mask', 'blocked_perimeter_mask')
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.walls = set()
+        self.perimeter_valves = {}
+        self.valves_positioning = {}
+        self.reservoirs = []
+        self.model = None
+        self.open_mask = 0
+        self.blocked_valves_mask = 0
+        self.blocked_perimeter_mask = 0
+
+    def _mask(self, nodes):
+        nodes = set(nodes)
+        if not nodes:
+            return 0
+        if self.model is None:
+            raise PlanningError('The processor must be compiled before its valves are opened or blocked')
+        return self.model.mask(nodes)
+
+    def _nodes(self, mask):
+        return frozenset(self.model.nodes(mask)) if mask else frozenset()
+
+    @property
+    def open(self):
+        return self._nodes(self.open_mask)
+
+    @open.setter
+    def open(self, nodes):
+        self.open_mask = self._mask(nodes)
+
+    @property
+    def blocked_valves(self):
+        return self._nodes(self.blocked_valves_mask)
+
+    @blocked_valves.setter
+    def blocked_valves(self, nodes):
+        self.blocked_valves_mask = self._mask(nodes)
+
+    @property
+    def blocked_perimeter(self):
+        return self._nodes(self.blocked_perimeter_mask)
+
+    @blocked_perimeter.setter
+    def blocked_perimeter(self, nodes):
+        self.blocked_perimeter_mask = self._mask(nodes)
+
+    #builds the indexes of the processor once all its features are known
+    def compile(self):
+        self.model = None
+        self.model = ChipModel(self)
+        return self.model
+
+    #sets the boundaries for the grid
+    def in_bounds(self, id):
+        (x, y) = id
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    #shows which valves are available
+    def passable(self, id):
+        if id not in self.walls:
+            if self.model is None or not (self.blocked_valves_mask | self.blocked_perimeter_mask) & self.model.bit_at.get(id, 0):
+                return id
+
+    #calculates which valves are neighbors of the active valve
+    def neighbors(self, id):
+        if self.model is not None and id in self.model.adjacent:
+            blocked = self.blocked_valves_mask | self.blocked_perimeter_mask
+            if not blocked:
+                return list(self.model.adjacent[id])
+            return [n for n, bit in self.model.adjacent_bits[id] if not blocked & bit]
+
+        (x, y) = id
+
+        results = [(x+1, y), (x, y-1), (x-1, y), (x, y+1)]
+
+
+        # used to block fluidic contact between perimeter valves and reservoirs
+        if (x,y) in (list(self.perimeter_valves.values())) or (list(self.reservoirs.values())):
+            if x == 0 or x == 1 or x == (self.width-2) or x == (self.width-1) :
+                results = [(x+1, y), (x-1, y)]
+
+            if y == 0 or y == 1 or y == (self.height-2) or y == (self.height-1):
+                results = [(x, y-1), (x, y+1)]
+
+
+        if (x + y) % 2 == 0: results.reverse() # aesthetics
+
+
+        results = filter(self.in_bounds, results)
+        results = filter(self.passable, results)
+        return results
+
+#Class to include weights in specific nodes in the graph
+class GridWithWeights(SquareGrid):
+    __slots__ = ('weights',)
+
+    def __init__(self, width, height):
+        super().__init__(width, height)
+        self.weights = {}
+
+    def cost(self, from_node, to_node):
+        return self.weights.get(to_node, 1)
+
+#Class needed for the Dijkstra algorithm
+class PriorityQueue:
+    def __init__(self):
+        self.elements = []
+
+    def empty(self):
+        return len(self.elements) == 0
+
+    def put(self, item, priority):
+        heapq.heappush(self.elements, (priority, item))
+
+    def get(self):
+        return heapq.heappop(self.elements)[1]
+
+
+def dijkstra_search(graph, start, goal=None):
+    '''Finds the path with the smallest cost between two given points in a grid;
+    without a goal, it finds the paths to all the nodes that can be reached from the start'''
+    frontier = PriorityQueue()
+    frontier.put(start, 0)
+    came_from = {}
+    cost_so_far = {}
+    came_from[start] = None
+    cost_so_far[start] = 0
+
+    while not frontier.empty():
+        current = frontier.get()
+
+        #early exit - when the shortest path is found, the algorithm stops
+        if current == goal:
+            break
+
+        for next in graph.neighbors(current):
+
+            new_cost = cost_so_far[current] + graph.cost(current, next)
+
+            if next not in cost_so_far or new_cost < cost_so_far[next]:
+                cost_so_far[next] = new_cost
+                priority = new_cost
+                frontier.put(next, priority)
+                came_from[next] = current
+
+    return came_from
+
+def reconstruct_path(came_from, start, goal):
+    '''Using the results from the Dijkdtra algorithm, returns the path with the smaller cost'''
+    current = goal
+    path = []
+    while current != start:
+        path.append(current)
+        try:
+            current = came_from[current]
+        except KeyError:
+            raise PlanningError('There is no fluidic path between %s and %s' % (start, goal))
+    path.append(start) # optional
+    path.reverse() # optional
+
+    return path
+
+
+def heuristic(a, b):
+    '''Calculates the distance between two nodes in a graph'''
+    try:
+        (x1, y1) = a
+        (x2, y2) = b
+    except TypeError:
+        raise PlanningError('Please, include a valid output')
+
+    return abs(x1 - x2) + abs(y1 - y2)
+
+def position_grid(my_processor, valve):
+    '''returns the coordinates of a specific valve in the grid
+    using the valve number'''
+    if valve in my_processor.reservoirs:
+        return my_processor.reservoirs[valve]
+    elif valve in my_processor.valves_positioning:
+        return my_processor.valves_positioning[valve]
+    elif valve in my_processor.perimeter_valves:
+        return my_processor.perimeter_valves[valve]
+
+
+def avoid(my_processor, *argv):
+    '''Eliminates non-working valves from consideration to be used in the processor'''
+    set_valves = set()
+    set_perimeter = set()
+
+    for arg in argv:
+        valve = str(arg)
+
+        if valve in my_processor.valves_positioning:
+            positioning = position_grid(my_processor, valve)
+            set_valves.add(positioning)
+
+        elif valve in my_processor.perimeter_valves:
+            peri = position_grid(my_processor, valve)
+            set_perimeter.add(peri)
+
+    my_processor.blocked_perimeter = set_perimeter
+    my_processor.blocked_valves = set_valves
+
+    return my_processor.blocked_perimeter,my_processor.blocked_valves
+
+
+def change_name(my_processor, old_key, new_key):
+    ''' Changes the name of a reservoir'''
+    my_processor.reservoirs[new_key] = my_processor.reservoirs.pop(old_key)
+    my_processor.compile()
+
+    return my_processor.reservoirs
+
+
+def available_neighbor(valve,my_processor,all_steps):
+    '''Return a list of neighboring valves of the processor from of a specific valve'''
+    available = []
+    neig = list(my_processor.neighbors(valve))
+    model = my_processor.model
+
+    #valves of the processor that are not open, blocked or already in the group
+    free = model.valve_mask & ~(my_processor.open_mask | my_processor.blocked_valves_mask | my_processor.blocked_perimeter_mask | model.mask(all_steps))
+    for n in neig:
+        if free & model.bit_at.get(n, 0):
+            available.append(n)
+
+    return available
+
+def select_whos_closer(available, goal,my_processor,all_steps,stop_valve_input):
+    '''From a list of available valves, returns the valve that is closer to the goal'''
+
+    distances = [heuristic(valve,goal) for valve in available]
+
+    if len(available) != 0:
+        ind = distances.index(min(distances))
+        valve = available[ind]
+
+        return valve
+
+    else:
+
+        available = list(my_processor.model.valve_cells - my_processor.open - set(all_steps) - my_processor.blocked_valves)
+
+        distances = [heuristic(valve,stop_valve_input) for valve in available]
+
+        if len(available) == 0:
+            raise PlanningError('Wrong number of valves opened')
+
+        ind = distances.index(min(distances))
+        valve = available[ind]
+
+        return valve
+
+def checking_closing(my_processor, closing):
+    '''Checks if there is a complete fluidic path to the output from the current valve, and changes valves positioning until it does
+
+    Every valve, when it is closed, must be a neighbor of a valve that is still open,
+    so the order is built from the last valve (the one next to the output) backwards:
+    at each step, among the valves that touch a valve already placed, the one that
+    was latest in the original list is placed. An order that is already valid is not
+    changed, and each valve and connection is visited once, so it always finishes.'''
+
+    if len(closing) < 2:
+        return closing
+
+    #valves that can be closed once a node is placed: i is closed before a neighbor of i
+    dependents = {}
+    for i, node in enumerate(closing):
+        for neighbor in my_processor.neighbors(node):
+            dependents.setdefault(neighbor, []).append(i)
+
+    last = len(closing) - 1
+    placed = set()
+    order = []
+    eligible = [-last]
+    done = [False] * len(closing)
+
+    while eligible:
+        i = -heapq.heappop(eligible)
+        if done[i]:
+            continue
+        done[i] = True
+        node = closing[i]
+        order.append(node)
+        if node not in placed:
+            placed.add(node)
+            for j in dependents.get(node, ()):
+                if not done[j]:
+                    heapq.heappush(eligible, -j)
+
+    if len(order) != len(closing):
+        isolated = [closing[i] for i in range(len(closing)) if not done[i]]
+        raise PlanningError('There is no fluidic path to the output while closing the valves %s' % (isolated,))
+
+    closing[:] = order[::-1]
+    return closing
+
+
+#files that describe the processor and its board, in the Processor_info folder
+DEFINITION_FILES = ('size.txt', 'walls.txt', 'reservoirs.txt', 'perimeter_valves.txt', 'valves_positioning.txt', 'Arduino_pins.txt')
+#changed when the classes saved in the cache change, so old caches are not used
+CACHE_VERSION = 3
+
+
+def read_definition(folder, name):
+    '''Reads one of the dictionaries / lists that describe the processor'''
+    #imported here: it is only needed when the processor is not in the cache
+    import ast
+    with open(os.path.join(folder, name), 'r') as inf:
+        return ast.literal_eval(inf.read())
+
+def cache_folder():
+    '''Folder of the cache of the processors: FLUIDIC_CACHE_DIR if it is set, otherwise
+    the cache folder of the user (LOCALAPPDATA on Windows, XDG_CACHE_HOME or ~/.cache)'''
+    folder = os.environ.get('FLUIDIC_CACHE_DIR')
+    if not folder:
+        base = os.environ.get('LOCALAPPDATA') if os.name == 'nt' else os.environ.get('XDG_CACHE_HOME')
+        folder = os.path.join(base or os.path.join(os.path.expanduser('~'), '.cache'), 'fluidic_manipulation')
+    return folder
+
+def _contents_hash(folder):
+    '''Hash of the contents of the files that describe the processor'''
+    import hashlib
+    digest = hashlib.sha1()
+    for name in DEFINITION_FILES:
+        try:
+            with open(os.path.join(folder, name), 'rb') as inf:
+                digest.update(inf.read())
+        except FileNotFoundError:
+            digest.update(b'missing')
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def _cache_file(contents):
+    return os.path.join(cache_folder(), 'processor_%s.pickle' % contents)
+
+def cache_path(folder):
+    '''Cache file of the processor described in a Processor_info folder'''
+    return _cache_file(_contents_hash(folder))
+
+def _write_cache(path, entry):
+    #each process writes its own temporary file, so processes started together do not mix them
+    temporary = '%s.%i.tmp' % (path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with open(temporary, 'wb') as out:
+            pickle.dump(entry, out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except OSError:
+        #the processor is still loaded if the cache cannot be written
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+def build_chip(folder):
+    '''Reads the grid of a processor and the pins of its board (None without Arduino_pins.txt)'''
+    my_processor = build_processor(folder)
+    pins = None
+    if os.path.exists(os.path.join(folder, 'Arduino_pins.txt')):
+        pins = read_definition(folder, 'Arduino_pins.txt')
+    return my_processor, pins
+
+def load_chip(folder, cache=True):
+    '''Returns the grid of the processor described in a Processor_info folder and the pins
+    of its board, from the cache when the files did not change'''
+    if not cache:
+        return build_chip(folder)
+
+    contents = _contents_hash(folder)
+    path = _cache_file(contents)
+    try:
+        with open(path, 'rb') as inf:
+            entry = pickle.load(inf)
+    except Exception:
+        #missing, corrupt, or saved by another version: the files are parsed again
+        entry = None
+    if isinstance(entry, dict) and entry.get('version') == CACHE_VERSION and entry.get('contents') == contents:
+        return entry['processor'], entry['pins']
+
+    my_processor, pins = build_chip(folder)
+    _write_cache(path, {'version': CACHE_VERSION, 'contents': contents, 'processor': my_processor, 'pins': pins})
+    return my_processor, pins
+
+def load_processor(folder, cache=True):
+    '''Returns the grid of the processor described in a Processor_info folder'''
+    return load_chip(folder, cache)[0]
+
+def build_processor(folder):
+    '''Builds the grid of the processor described in a Processor_info folder'''
+
+    #size of the grid that can contain all features
+    width, height = read_definition(folder, 'size.txt')[:2]
+    my_processor = GridWithWeights(width, height)
+
+    #definition of the nodes that do not codify a valve
+    #Will be represented as # in the grid
+    my_processor.walls = set(read_definition(folder, 'walls.txt'))
+
+    #dictionary containing the reservoir name as the key for the node they code
+    # these are not valves and therefore CANNOT BE ACTUATED
+    my_processor.reservoirs = read_definition(folder, 'reservoirs.txt')
+
+    #dictionary containing the perimeter valve name as the key for the node they code
+    #Perimeter valves do not have connections in all directions, and act as bridges
+    #between the reservoirs and the processor
+    my_processor.perimeter_valves = read_definition(folder, 'perimeter_valves.txt')
+
+    #dictionary containing the valve name as the key for the node they code
+    #These are the valves of the processor
+    my_processor.valves_positioning = read_definition(folder, 'valves_positioning.txt')
+
+    my_processor.compile()
+    return my_processor
+
+def load_pins(folder, cache=True):
+    '''dictionary containing the pins of the Arduino that will actuate a specific solenoid valve'''
+    pins = load_chip(folder, cache)[1]
+    if pins is None:
+        #raises the error of the missing file
+        return read_definition(folder, 'Arduino_pins.txt')
+    return pins
+
+
+def parse_inputs(text):
+    '''Separates a text in the format A : Number, B : Number into a dictionary of inputs and ratios'''
+    without_space = text.replace(" ", "")
+    sentences = re.split(r'[,;]+', without_space)
+
+    d = {}
+    if sentences != ['']:
+        for item in sentences:
+            valve = str(item.split(':')[0]).upper()
+            try:
+                number = int(item.split(':')[1])
+            except (IndexError, ValueError):
+                raise PlanningError('Please, add valve to be used in the format A : Number')
+            d[valve] = number
+
+    return d
+
+def parse_avoid(text):
+    '''Separates a text in the format Number, Number into a list of valves to be avoided'''
+    without_space = text.replace(" ", "")
+    avoid_valves = []
+    if without_space != '':
+        for item in re.split(r'[,;]+', without_space):
+            try:
+                avoid_valves.append(int(item))
+            except ValueError:
+                raise PlanningError('If input / output is unavailable, select another')
+
+    return avoid_valves
+
+
+#Class that holds the result of a transfer
+class Plan:
+    def __init__(self, output, inputs, wait, routine, groups=None):
+        self.output = output
+        self.inputs = inputs
+        self.wait = wait
+        #list of entries in the format 'o1,w,' read by other software
+        self.routine = routine
+        #valves (by position) used by each input
+        self.groups = groups or {}
+
+    def __repr__(self):
+        return 'Plan(output=%r, inputs=%r, wait=%r, steps=%i)' % (self.output, self.inputs, self.wait, len(self.routine))
+
+    def commands(self):
+        '''Returns the routine as the list of commands used by the methods (o1, w300, c1...)'''
+        new = []
+        for item in self.routine:
+            for command in item.split(','):
+                command = command.strip()
+                if command == 'w':
+                    new.append('w' + str(self.wait))
+                elif command != '':
+                    new.append(command)
+        return new
+
+    def text(self, description=''):
+        '''Returns the routine file that can be read by other software'''
+        #makes a list that can be read by other software
+        text = 'from ocwcomposer import *\n'
+        text += 'seq1 = Sequence("' + str(description) + '",'
+        text += '    SetDefaultWait(%i),' % self.wait
+        for item in self.routine:
+            text += item.strip('"\'')
+        text += ')'
+        return text
+
+
+def write_routine(plan, folder, filename, description='', catalogue=None, chip=None, metrics=None):
+    '''Saves the routine of a plan in a folder, without replacing other routines,
+    and returns the path and the name of the file;
+    with a catalogue (catalogue.py) of the folder, the name is given by the catalogue
+    and the routine is indexed with its processor, inputs and output'''
+    start = time.perf_counter()
+    file_name = str(filename)
+    if catalogue is not None:
+        file_name = catalogue.allocate(file_name)
+    else:
+        i=1
+        while os.path.exists(os.path.join(folder, file_name + ".py")) == True:
+            file_name = file_name + '(' + str(i) + ')'
+            i = i+1
+
+    final_dest = os.path.join(folder, file_name + '.py')
+    with open(final_dest, 'w') as file:
+        file.write(plan.text(description))
+
+    if catalogue is not None:
+        catalogue.add(file_name, plan.commands(), chip, plan.inputs, plan.output, description)
+
+    if metrics is not None:
+        metrics.record('write', time.perf_counter() - start, start)
+    return final_dest, file_name
+
+
+#Class that plans fluidic transfers in a specific processor
+#grid can be 'dict' (default) or 'array', which reads the distances from the
+#numpy fields of array_grid.py and is faster in large processors;
+#with the array grid, metric can also be 'fluidic' to grow the groups of valves
+#using the length of the paths in the processor instead of the manhattan distance
+#A processor and its pins already loaded can be given instead of the folder
+#With incremental=True, the shortest paths are repaired when the avoided valves
+#change (incremental.py) instead of searched again for each set of avoided valves
+#search chooses how the paths between two valves are found: 'dijkstra' (default) keeps
+#the whole Dijkstra tree of each start, 'astar' and 'bidirectional' search each
+#pair of valves with the backends of search.py
+#The time of each phase of the planning is kept in metrics (metrics.py)
+class Planner:
+    def __init__(self, folder, path_cache=None, grid='dict', metric='manhattan', processor=None, pins=None, incremental=False, search='dijkstra', metrics=None):
+        self.folder = folder
+        if processor is None and pins is None:
+            processor, pins = load_chip(folder)
+            if pins is None:
+                pins = load_pins(folder)
+        self.processor = processor if processor is not None else load_processor(folder)
+        self.pins = pins if pins is not None else load_pins(folder)
+        #can be shared between planners of the same processor
+        self.paths = path_cache if path_cache is not None else PathCache()
+        self.incremental = None
+        if incremental:
+            from incremental import IncrementalPaths
+            self.incremental = IncrementalPaths()
+
+        self.search = search
+        self._search = None
+        if search != 'dijkstra':
+            from search import SEARCHES
+            if search not in SEARCHES:
+                raise ValueError("search should be 'dijkstra', 'astar' or 'bidirectional'")
+            if incremental:
+                raise ValueError('The incremental paths use the dijkstra search')
+            self._search = SEARCHES[search]
+            if search == 'bidirectional':
+                #the nodes that have each node as a neighbor, kept for all the searches
+                from incremental import predecessors
+                self._search = functools.partial(self._search, previous=predecessors(self.processor.model))
+        #nodes expanded by the searches that were not in the cache
+        self.expanded = 0
+        if metrics is None:
+            metrics = Metrics({'chip': self.processor.model.digest[:12], 'grid': grid, 'search': search})
+        self.metrics = metrics
+
+        self.metric = metric
+        self.array = None
+        if grid == 'array':
+            import array_grid
+            self.array = array_grid.ArrayGrid(self.processor)
+            self._select_from_field = array_grid.select_whos_closer
+        elif grid != 'dict':
+            raise ValueError("grid should be 'dict' or 'array'")
+        if metric != 'manhattan' and self.array is None:
+            raise ValueError("The %r metric needs grid='array'" % metric)
+
+    def refresh(self):
+        '''Opens all the valves for a new plan'''
+        self.processor.blocked_perimeter_mask = 0
+        self.processor.blocked_valves_mask = 0
+        self.processor.open_mask = 0
+
+    def shortest_path(self, start, goal):
+        '''Returns the path with the smallest cost between two nodes, reusing the
+        search from the same start while the blocked valves do not change'''
+        metrics = self.metrics
+        if self.incremental is not None:
+            with metrics.timer('search'):
+                return self.incremental.shortest_path(self.processor, start, goal)
+        if self._search is not None:
+            key = self.paths.key(self.processor, start, goal, self.search)
+            path = self.paths.get(key)
+            if path is None:
+                metrics.count('path_cache_misses')
+                with metrics.timer('search'):
+                    path, expanded = self._search(self.processor, start, goal)
+                self.expanded += expanded
+                metrics.count('nodes_expanded', expanded)
+                self.paths.put(key, path)
+            else:
+                metrics.count('path_cache_hits')
+            return list(path)
+
+        key = self.paths.key(self.processor, start)
+        came_from = self.paths.get(key)
+        if came_from is None:
+            metrics.count('path_cache_misses')
+            with metrics.timer('search'):
+                came_from = dijkstra_search(self.processor, start)
+            self.expanded += len(came_from)
+            metrics.count('nodes_expanded', len(came_from))
+            self.paths.put(key, came_from)
+        else:
+            metrics.count('path_cache_hits')
+        return reconstruct_path(came_from, start, goal)
+
+    def perimeter_name(self, reservoir):
+        '''Returns the name of the perimeter valve that connects a reservoir to the processor'''
+        my_processor = self.processor
+        try:
+            return my_processor.model.perimeter_at[my_processor.neighbors(my_processor.model.position(reservoir))[0]]
+        except (KeyError, IndexError):
+            raise PlanningError('Please, include a valid output')
+
+    def transfer(self, inputs, output, avoid_valves=(), wait=300, groups=None):
+        clock = self.metrics.clock()
+        self.metrics.count('transfers')
+        try:
+            return self._transfer(inputs, output, avoid_valves, wait, groups, clock)
+        except PlanningError:
+            self.metrics.count('failed_transfers')
+            raise
+        finally:
+            clock.total('transfer')
+
+    def _transfer(self, inputs, output, avoid_valves, wait, groups, clock):
+        '''Plans the transfer of fluid from one reservoir to another
+        using the microfluidic processor. Necessary to include:
+        1. the inputs with their respective ratios ({valve1:ratio1,valve2:ratio2...});
+        to move fluid from one input to the output, just use one input and one ratio
+        2. the name of the output reservoir;
+        3. the number of the valves that should be avoided
+        (can be empty, in the case none valves should be avoided)
+        and;
+        4. the waiting time between operations (ms)
+        The valves (positions) of each input can be given in groups ({input: [valves]});
+        otherwise each group grows from the input towards the output'''
+        given = groups
+        self.refresh()
+        my_processor = self.processor
+        model = my_processor.model
+        waiting_time = int(wait)
+
+        #This is run in the case there are no inputs or outputs; it is required to provide a waiting time between processes
+        if inputs == {}:
+            if output == '':
+                return Plan(output, {}, waiting_time, ['w'])
+            raise PlanningError('Please, include at least one input')
+
+        # It avoids that non-working valves can be used to move fluids
+        avoid(my_processor, *avoid_valves)
+        clock.lap('avoid')
+
+        #sets the output
+        output_ = model.position(output)
+        if str(output) not in model.reservoirs:
+            raise PlanningError('Please, include a valid output')
+
+        #checking if the number of valves required is equal or smaller than the
+        #number of valves available in the processor, and also if the input and the output are the same
+        value_total = 0
+
+        #Sorts the inputs by the number of valves required
+        #Smaller number of valves is selected first
+        inputs_sorted = sorted(inputs.items(), key=lambda kv: kv[1])
+
+        for key, value in inputs_sorted:
+            #checking if the input and the output are the same - Maybe remove it if implementing the
+            #complementary mixing function
+            if key == output:
+                raise PlanningError('The input and the output are the same')
+
+            if str(key) not in model.reservoirs:
+                raise PlanningError('%s is not a reservoir of the processor' % key)
+
+            value_total = value_total + value
+
+            valves_available = (len(my_processor.valves_positioning)- bin(my_processor.blocked_valves_mask).count('1'))
+
+            if value_total > valves_available:
+                raise PlanningError('There are more valves required by the inputs than valves available in the processor')
+
+        clock.lap('check')
+
+        #distance from the valves to the output
+        if self.array is not None:
+            to_output = self.array.field_to(str(output), my_processor, self.metric)
+            distance_to_output = lambda node: int(to_output[node])
+        else:
+            distance_to_output = lambda node: heuristic(node, output_)
+
+        #Check for the shortest path for all the valves
+        groups = {}
+        used = {}
+
+        for key, value in inputs_sorted:
+            input_ = model.position(key)
+            try:
+                stop_valve_input = my_processor.neighbors(input_)[0]
+            except IndexError:
+                raise PlanningError('The input %s is not connected to the processor' % key)
+            all_steps = []
+
+            if given is not None:
+                all_steps = list(given.get(key, ()))
+                free = model.valve_mask & ~(my_processor.open_mask | my_processor.blocked_valves_mask)
+                if len(all_steps) != value or len(set(all_steps)) != value or not all(free & model.bit_at.get(node, 0) for node in all_steps):
+                    raise PlanningError('The valves given for %s cannot be used' % key)
+
+            valve = stop_valve_input
+            while len(all_steps)<value:
+                available = available_neighbor(valve,my_processor,all_steps)
+                if self.array is None:
+                    valve = select_whos_closer(available, output_,my_processor,all_steps,stop_valve_input)
+                else:
+                    valve = self._select_from_field(available, to_output, self.array, my_processor, all_steps, stop_valve_input)
+                all_steps.append(valve)
+
+            groups.update({key:all_steps})
+            used[key] = list(all_steps)
+            my_processor.open_mask |= model.mask(all_steps)
+
+        if bin(my_processor.open_mask).count('1')!= value_total:
+            raise PlanningError('Wrong number of valves opened')
+        clock.lap('groups')
+
+        #opens the valves from the output to the first set of open valves
+        to_close = []
+        distance = []
+
+        #creates a list of which valves are going to be opened
+        #from the outlet towards the other group of valves
+        contact = []
+        available2 = model.valve_mask & ~(my_processor.open_mask | my_processor.blocked_valves_mask)
+
+        #Changes valves coordinates into their names (info codified in the dictionary)
+        opening_by_name = []
+        for key in groups.keys():
+            list_a = groups[key]
+
+            distances1 = []
+            for node in list_a:
+                distance_node = (distance_to_output(node),(node),key)
+                distances1.append(distance_node)
+
+            organized = sorted(distances1, key=lambda x: x[0])
+
+            distance.append(organized)
+
+            #opens the valves by name instead of position
+            opening_by_name.append('o' + self.perimeter_name(key) +',' + 'w,')
+
+            for valve_position in list_a:
+                value = model.valve_at[valve_position]
+
+                string =  'o' + value +',' + 'w,'
+
+                opening_by_name.append(string)
+
+            opening_by_name.append('c' + self.perimeter_name(key) +',' + 'w,')
+
+        #Make a list to open the valves in the correct order
+        organized2 = sorted(distance, key=lambda x: x[0][0])
+
+        all_steps2 = self.shortest_path(output_, organized2[0][0][1])[2:-1]
+
+        new = groups.pop(organized2[0][0][2])
+
+        for v in all_steps2:
+            bit = model.bit_at.get(v, 0)
+            if available2 & bit:
+                my_processor.open_mask |= bit
+                new.append(v)
+                to_close.append(v)
+                contact.append(v)
+
+        sorting = organized2[0][0][2]
+
+        for i in organized2[0]:
+            if i[2] == sorting:
+                to_close.append(i[1])
+
+        opening_by_name2 = []
+        opening_by_name2.append('o' + self.perimeter_name(output) +',' + 'w,')
+
+        while groups !={}:
+
+        #opens the valves from the first set of open valves connected to the output to the
+        #next set of open valves
+            distance_total =[]
+
+            for node1 in new:
+                distances2 = []
+                for key in groups.keys():
+                    lista2 = groups[key]
+
+                    for node2 in lista2:
+                        distance_node1 = (heuristic(node1,node2),(node1),(node2),key)
+                        distances2.append(distance_node1)
+
+                organized3 = sorted(distances2, key=lambda x: x[0])
+
+                distance_total.append(organized3)
+            organized4 = sorted(distance_total, key=lambda x: x[0][0])
+
+            all_steps3 = self.shortest_path(organized4[0][0][1],organized4[0][0][2])[1:-1]
+
+            new = groups.pop(organized4[0][0][3])
+
+            for v in all_steps3:
+                bit = model.bit_at.get(v, 0)
+                if available2 & bit:
+                    my_processor.open_mask |= bit
+                    new.append(v)
+                    to_close.append(v)
+                    contact.append(v)
+
+            sorting2 = organized4[0][0][3]
+
+            for i in organized4[0]:
+                if i[3] == sorting2:
+                    to_close.append(i[2])
+
+        #opens the valves by name instead of position
+        for valve_position2 in contact:
+            value = model.valve_at[valve_position2]
+
+            string = 'o' + value +',' + 'w,'
+
+            opening_by_name2.append(string)
+
+        #reverses the closing list to end it with the output
+        closing = to_close[::-1]
+
+        clock.lap('connect')
+
+        #Checks if there is a fluidic path between the valves during the closing step
+        checking_closing(my_processor, closing)
+        clock.lap('closing')
+        self.metrics.count('closed_valves', len(closing))
+
+        #Returns the valves by numbers / names instead of their position in the grid
+        closing_by_name = []
+        for valve_position in closing:
+            value = model.valve_at[valve_position]
+
+            string = 'c' + value +',' + 'w,'
+
+            closing_by_name.append(string)
+
+        closing_by_name.append('c' + self.perimeter_name(output) +',w')
+
+        routine = []
+        routine.extend(opening_by_name)
+        routine.extend(opening_by_name2)
+        routine.extend(closing_by_name)
+        clock.lap('routine')
+
+        return Plan(output, dict(inputs), waiting_time, routine, used)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Search of the groups of valves of a transfer within a time budget
+
+Planner.transfer() grows the group of each input one valve at a time, always
+towards the output, and jumps to any free valve when it is stuck, which can
+leave groups apart from each other and long paths to connect them.
+
+search_groups() starts from that plan and searches, depth first and in a fixed
+order, the groups that are chains of free valves starting next to each input:
+the chains of the first input, and for each of them the chains of the next
+input that do not use its valves, and so on, trying first the valves closer to
+the output. Every combination is planned with Planner.transfer(groups=...) and
+the best plan so far is kept, so the search can be stopped at any time. The
+plans are compared by:
+    'actuations'  number of steps of the routine (default)
+    'valves'      number of valves opened to connect the groups to the output
+and then by the other one.
+
+Every plan of a transfer has the same steps besides opening and closing each
+valve that connects the groups, so a plan that needs no connecting valves is the
+best possible one (the lower bound). The search stops there, when every
+combination was tried, when the time budget ends or after a number of plans
+(limit). The result is reported as optimal only when it reaches the lower bound;
+when every combination was tried it is the best plan among the chains (the
+greedy groups may not be chains), and otherwise the best plan found within the
+budget.
+
+usage: python group_search.py specs.txt --chip Processor_info --budget 0.1
+
+"""
+#import the necessary libraries
+import argparse
+import sys
+import time
+from fluidic_planner import Planner, PlanningError, heuristic
+
+
+def plan_cost(plan, my_processor):
+    '''Returns (actuations, valves opened to connect the groups) of a plan'''
+    valves = set()
+    for item in plan.commands():
+        if item.startswith('o') and item[1:] in my_processor.valves_positioning:
+            valves.add(item[1:])
+    return len(plan.routine), len(valves) - sum(plan.inputs.values())
+
+
+#Result of a search: the best plan, the greedy plan and how the search went
+class GroupSearch:
+    def __init__(self, plan, greedy, cost, greedy_cost, tries, elapsed, greedy_elapsed, history, bound=None, complete=False):
+        self.plan = plan
+        self.greedy = greedy
+        self.cost = cost
+        self.greedy_cost = greedy_cost
+        #plans tried
+        self.tries = tries
+        self.elapsed = elapsed
+        self.greedy_elapsed = greedy_elapsed
+        #(time, cost) of each improvement
+        self.history = history
+        #cost of a plan without connecting valves, and whether every combination was tried
+        self.bound = bound if bound is not None else cost
+        self.complete = complete
+
+    def __repr__(self):
+        return 'GroupSearch(actuations=%i, greedy=%i, tries=%i, optimal=%s, %.1f ms)' % (
+            self.cost[0], self.greedy_cost[0], self.tries, self.optimal, self.elapsed * 1000)
+
+    @property
+    def optimal(self):
+        '''True when the plan reaches the lower bound, so no groups give a better plan'''
+        return tuple(self.cost) == tuple(self.bound)
+
+    def status(self):
+        '''optimal, chains (every chain was tried) or budget'''
+        return 'optimal' if self.optimal else 'chains' if self.complete else 'budget'
+
+
+def _chains(my_processor, entries, size, taken, output_):
+    '''Chains of size free valves that start at one of the entries, in a fixed order that
+    tries first the valves closer to the output; they are produced as they are found'''
+    valve_cells = my_processor.model.valve_cells
+    closer = lambda nodes: sorted(nodes, key=lambda node: (heuristic(node, output_), node))
+    stack = [[node] for node in reversed(closer(node for node in entries if node in valve_cells and node not in taken))]
+    while stack:
+        chain = stack.pop()
+        if len(chain) == size:
+            yield chain
+            continue
+        available = [node for node in my_processor.neighbors(chain[-1]) if node in valve_cells and node not in taken and node not in chain]
+        for node in reversed(closer(available)):
+            stack.append(chain + [node])
+
+
+def search_groups(planner, inputs, output, avoid_valves=(), wait=300, budget=0.05, objective='actuations', limit=None):
+    '''Searches the groups of valves with the best plan until the lower bound is reached,
+    every combination was tried, the budget (s) ends or limit plans were tried'''
+    if objective not in ('actuations', 'valves'):
+        raise ValueError("objective should be 'actuations' or 'valves'")
+    rank = (lambda cost: cost) if objective == 'actuations' else (lambda cost: (cost[1], cost[0]))
+
+    start = time.perf_counter()
+    greedy = planner.transfer(inputs, output, avoid_valves, wait)
+    greedy_elapsed = time.perf_counter() - start
+    my_processor = planner.processor
+    if not greedy.groups:
+        cost = (len(greedy.routine), 0)
+        return GroupSearch(greedy, greedy, cost, cost, 0, greedy_elapsed, greedy_elapsed, [], cost, True)
+
+    best = greedy
+    best_cost = greedy_cost = plan_cost(greedy, my_processor)
+    history = [(greedy_elapsed, best_cost)]
+    #each connecting valve is opened and closed once
+    bound = (greedy_cost[0] - 2 * greedy_cost[1], 0)
+    output_ = my_processor.model.position(output)
+    keys = [key for key, value in sorted(inputs.items(), key=lambda kv: kv[1])]
+    #valves next to the perimeter valve of each input
+    entries = {key: my_processor.neighbors(my_processor.neighbors(my_processor.model.position(key))[0]) for key in keys}
+    blocked = set(my_processor.blocked_valves)
+
+    tries = 0
+    deadline = start + budget
+    #chains chosen for the first inputs, and the chains left to try for each input
+    chosen = []
+    iterators = [_chains(my_processor, entries[keys[0]], inputs[keys[0]], blocked, output_)]
+    while iterators:
+        if rank(best_cost) <= rank(bound) or time.perf_counter() >= deadline or (limit is not None and tries >= limit):
+            break
+        chain = next(iterators[-1], None)
+        if chain is None:
+            iterators.pop()
+            if chosen:
+                chosen.pop()
+            continue
+        if len(iterators) < len(keys):
+            chosen.append(chain)
+            key = keys[len(iterators)]
+            iterators.append(_chains(my_processor, entries[key], inputs[key], blocked.union(*chosen), output_))
+            continue
+
+        tries += 1
+        groups = dict(zip(keys, chosen + [chain]))
+        try:
+            plan = planner.transfer(inputs, output, avoid_valves, wait, groups)
+        except PlanningError:
+            continue
+        cost = plan_cost(plan, my_processor)
+        if rank(cost) < rank(best_cost):
+            best, best_cost = plan, cost
+            history.append((time.perf_counter() - start, cost))
+
+    return GroupSearch(best, greedy, best_cost, greedy_cost, tries, time.perf_counter() - start, greedy_elapsed, history,
+                       bound, not iterators)
+
+
+def main(argv=None):
+    from batch_transfer import parse_spec
+    parser = argparse.ArgumentParser(description='Compares the greedy groups of valves with the groups found by a search')
+    parser.add_argument('specs', help='file with one routine per line, as in batch_transfer.py')
+    parser.add_argument('--chip', default='Processor_info', help='folder with the processor information')
+    parser.add_argument('--budget', type=float, default=0.05, help='time of the search of each routine (s)')
+    parser.add_argument('--objective', default='actuations', choices=['actuations', 'valves'], help='what the search minimizes')
+    parser.add_argument('--limit', type=int, help='largest number of plans tried for each routine')
+    args = parser.parse_args(argv)
+
+    planner = Planner(args.chip)
+    with open(args.specs, 'r') as inf:
+        lines = [line.strip() for line in inf if line.strip() and not line.startswith('#')]
+
+    print('%-20s %10s %10s %10s %10s %10s %10s %10s %8s' % ('routine', 'greedy', 'search', 'greedy', 'search', 'greedy ms', 'search ms', 'tries', 'result'))
+    print('%-20s %10s %10s %10s %10s %10s %10s %10s %8s' % ('', 'steps', 'steps', 'valves', 'valves', '', '', '', ''))
+    totals = [0, 0, 0.0, 0.0]
+    optimal = 0
+    for line in lines:
+        try:
+            name, inputs, output, avoid_valves, wait, description = parse_spec(line)
+            result = search_groups(planner, inputs, output, avoid_valves, wait, args.budget, args.objective, args.limit)
+        except PlanningError as error:
+            print('%-20s %s' % (line.split('|')[0].strip(), error))
+            continue
+        print('%-20s %10i %10i %10i %10i %10.2f %10.2f %10i %8s' % (name, result.greedy_cost[0], result.cost[0], result.greedy_cost[1],
+                                                                    result.cost[1], result.greedy_elapsed * 1000, result.elapsed * 1000,
+                                                                    result.tries, result.status()))
+        totals[0] += result.greedy_cost[0]
+        totals[1] += result.cost[0]
+        totals[2] += result.greedy_elapsed
+        totals[3] += result.elapsed
+        optimal += result.optimal
+    print('%-20s %10i %10i %10s %10s %10.2f %10.2f %10s %8i' % ('total', totals[0], totals[1], '', '', totals[2] * 1000, totals[3] * 1000, '', optimal))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
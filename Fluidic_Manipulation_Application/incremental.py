@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Shortest paths repaired when valves fail
+
+An IncrementalTree keeps the cost of the shortest path from a start node to
+every node of the processor (Lifelong Planning A*, without a goal). When valves
+are blocked (avoided) or unblocked, only the nodes whose cost changes are
+searched again, instead of the whole processor.
+
+The paths are read from the costs choosing, at each node, the same previous
+node as dijkstra_search() (the one with the smallest cost and then the smallest
+coordinates), so the planner makes the same routines with both.
+
+fallback_plans() plans a transfer and, for each valve it uses, the same
+transfer avoiding that valve, so if a valve fails during a campaign the routine
+that replaces it is already known.
+
+"""
+#import the necessary libraries
+import heapq
+from fluidic_planner import PlanningError
+
+INFINITY = float('inf')
+
+
+def predecessors(model):
+    '''Returns, for each node, the nodes that have it as a neighbor'''
+    previous = {node: [] for node in model.adjacent}
+    for node, neighbors in model.adjacent.items():
+        for neighbor in neighbors:
+            previous.setdefault(neighbor, []).append(node)
+    return previous
+
+
+#Costs of the shortest paths from a node, kept up to date with the blocked valves of a grid
+class IncrementalTree:
+    def __init__(self, graph, start, previous=None):
+        self.graph = graph
+        self.start = start
+        self.digest = graph.model.digest
+        self.successors = graph.model.adjacent
+        self.previous = previous if previous is not None else predecessors(graph.model)
+        #mask of the nodes blocked when the costs were last computed (chip_model.py)
+        self.blocked = 0
+        self.bit_at = graph.model.bit_at
+        self.g = {}
+        self.rhs = {start: 0}
+        self._queue = [(0, start)]
+        #nodes searched, in total and in the last update
+        self.expanded = 0
+        self.last_expanded = 0
+        self.sync()
+
+    def _cost(self, node):
+        return self.g.get(node, INFINITY)
+
+    def _update(self, node):
+        if node != self.start:
+            if self.blocked & self.bit_at.get(node, 0):
+                rhs = INFINITY
+            else:
+                rhs = INFINITY
+                for other in self.previous.get(node, ()):
+                    cost = self.g.get(other, INFINITY)
+                    if cost != INFINITY:
+                        rhs = min(rhs, cost + self.graph.cost(other, node))
+            self.rhs[node] = rhs
+        g = self._cost(node)
+        rhs = self.rhs.get(node, INFINITY)
+        if g != rhs:
+            heapq.heappush(self._queue, (min(g, rhs), node))
+
+    def _compute(self):
+        expanded = 0
+        queue = self._queue
+        while queue:
+            key, node = heapq.heappop(queue)
+            g = self._cost(node)
+            rhs = self.rhs.get(node, INFINITY)
+            #entries left in the queue by later changes of the node
+            if g == rhs or key != min(g, rhs):
+                continue
+            expanded += 1
+            if g > rhs:
+                self.g[node] = rhs
+            else:
+                self.g[node] = INFINITY
+                self._update(node)
+            for neighbor in self.successors.get(node, ()):
+                self._update(neighbor)
+        self.expanded += expanded
+        self.last_expanded = expanded
+        return expanded
+
+    def sync(self):
+        '''Repairs the costs after the blocked valves of the grid changed;
+        returns the number of nodes searched again'''
+        blocked = self.graph.blocked_valves_mask | self.graph.blocked_perimeter_mask
+        changed = blocked ^ self.blocked
+        self.blocked = blocked
+        for node in self.graph.model.nodes(changed):
+            self._update(node)
+        return self._compute()
+
+    def path(self, goal):
+        '''Returns the shortest path from the start to a node, as reconstruct_path()'''
+        if self._cost(goal) == INFINITY:
+            raise PlanningError('There is no fluidic path between %s and %s' % (self.start, goal))
+        path = [goal]
+        node = goal
+        while node != self.start:
+            cost = self.g[node]
+            best = None
+            for other in self.previous[node]:
+                previous_cost = self._cost(other)
+                if previous_cost + self.graph.cost(other, node) == cost and (best is None or (previous_cost, other) < best):
+                    best = (previous_cost, other)
+            node = best[1]
+            path.append(node)
+        path.reverse()
+        return path
+
+
+#Incremental trees of the nodes of a processor, used by Planner(incremental=True)
+class IncrementalPaths:
+    def __init__(self):
+        self.trees = {}
+        self._previous = {}
+        self.built = 0
+        self.repaired = 0
+
+    def shortest_path(self, graph, start, goal):
+        '''Returns the shortest path between two nodes in the current topology of the grid'''
+        digest = graph.model.digest
+        tree = self.trees.get(start)
+        if tree is None or tree.graph is not graph or tree.digest != digest:
+            if digest not in self._previous:
+                self._previous = {digest: predecessors(graph.model)}
+            tree = IncrementalTree(graph, start, self._previous[digest])
+            self.trees[start] = tree
+            self.built += 1
+        elif tree.sync():
+            self.repaired += 1
+        return tree.path(goal)
+
+    def clear(self):
+        self.trees.clear()
+        self._previous.clear()
+
+    def info(self):
+        '''Returns the counters of the trees'''
+        return {'trees': len(self.trees), 'built': self.built, 'repaired': self.repaired,
+                'expanded': sum(tree.expanded for tree in self.trees.values())}
+
+
+def used_valves(plan, my_processor):
+    '''Returns the valves of the processor (not the perimeter valves) opened by a plan'''
+    valves = []
+    for item in plan.commands():
+        if item.startswith('o') and item[1:] in my_processor.valves_positioning and item[1:] not in valves:
+            valves.append(item[1:])
+    return valves
+
+
+def fallback_plans(planner, inputs, output, avoid_valves=(), wait=300):
+    '''Plans a transfer and, for each valve it uses, the transfer avoiding that valve too;
+    returns the plan and {valve: plan}, with the PlanningError of the transfers that
+    cannot be made without the valve'''
+    plan = planner.transfer(inputs, output, avoid_valves, wait)
+    fallbacks = {}
+    for valve in used_valves(plan, planner.processor):
+        try:
+            fallbacks[valve] = planner.transfer(inputs, output, tuple(avoid_valves) + (valve,), wait)
+        except PlanningError as error:
+            fallbacks[valve] = error
+    return plan, fallbacks
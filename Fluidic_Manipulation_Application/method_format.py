@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled format of the methods
+
+When a method is saved, a compiled copy (.fmb) is written next to the text file.
+It starts with a header and has one fixed-width record per command, with the
+valve already converted into the pin of the board:
+
+    header   magic 'FMB1', version, record size, chip hash (sha1), number of records
+    record   opcode (0 open, 1 close, 2 wait), pin, duration (ms)
+
+The chip hash covers the processor and its pins, so a method compiled for
+another processor (or another wiring) is not executed. The file is read with
+mmap, so loading is instant even for very long methods, and the records are
+read as the method is executed, without parsing any text.
+
+"""
+#import the necessary libraries
+import hashlib
+import mmap
+import os
+import struct
+from execution import group_steps
+
+MAGIC = b'FMB1'
+VERSION = 1
+HEADER = struct.Struct('<4sHH20sI')
+RECORD = struct.Struct('<BxHI')
+
+OPEN = 0
+CLOSE = 1
+WAIT = 2
+
+
+#Error raised when a compiled method cannot be used
+class MethodFormatError(Exception):
+    pass
+
+
+def chip_hash(model, Python_to_arduino):
+    '''Hash of a processor and of the pins of its valves'''
+    definition = (model.digest, sorted(Python_to_arduino.items()))
+    return hashlib.sha1(repr(definition).encode()).digest()
+
+
+def compile_method(lists, Python_to_arduino, digest):
+    '''Converts the commands of a method (o1, w300, c1...) into the compiled format'''
+    records = []
+    #the same commands repeat many times in a method, so each one is packed once
+    packed = {}
+    for item in lists:
+        record = packed.get(item)
+        if record is None:
+            if item.startswith("o") or item.startswith("c"):
+                valve = str(''.join(filter(str.isdigit,item)))
+                if valve not in Python_to_arduino:
+                    raise MethodFormatError('The valve %s has no pin in the board' % valve)
+                record = RECORD.pack(OPEN if item.startswith("o") else CLOSE, Python_to_arduino[valve], 0)
+            elif item.startswith("w"):
+                record = RECORD.pack(WAIT, 0, int(''.join(filter(str.isdigit,item))))
+            else:
+                record = b''
+            packed[item] = record
+        if record:
+            records.append(record)
+
+    return HEADER.pack(MAGIC, VERSION, RECORD.size, digest, len(records)) + b''.join(records)
+
+
+def write_compiled(path, lists, Python_to_arduino, digest):
+    '''Saves the compiled copy of a method'''
+    data = compile_method(lists, Python_to_arduino, digest)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as out:
+        out.write(data)
+    os.replace(temporary, path)
+    return path
+
+
+def compiled_path(path):
+    '''Path of the compiled copy of a method file'''
+    return os.path.splitext(path)[0] + '.fmb'
+
+
+#Compiled method mapped in memory
+class CompiledMethod:
+    def __init__(self, path, digest=None):
+        self.path = path
+        self._map = None
+        with open(path, 'rb') as inf:
+            try:
+                self._map = mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise MethodFormatError('%s is empty' % path)
+
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise MethodFormatError('%s is not a compiled method' % path)
+        magic, version, record_size, self.digest, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise MethodFormatError('%s is not a compiled method of this version' % path)
+        if len(self._map) != HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise MethodFormatError('%s is incomplete' % path)
+        if digest is not None and digest != self.digest:
+            self.close()
+            raise MethodFormatError('%s was compiled for another processor' % path)
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def records(self, start=0):
+        '''Returns the (opcode, pin, duration) of the records, from a record on'''
+        unpack_from = RECORD.unpack_from
+        for offset in range(HEADER.size + start * RECORD.size, HEADER.size + self.count * RECORD.size, RECORD.size):
+            yield unpack_from(self._map, offset)
+
+    def actions(self, start=0):
+        '''Returns the records as the actions executed by MethodExecutor'''
+        for opcode, pin, duration in self.records(start):
+            if opcode == OPEN:
+                yield ('set', (pin, 1), 'high %i' % pin)
+            elif opcode == CLOSE:
+                yield ('set', (pin, 0), 'low %i' % pin)
+            else:
+                yield ('wait', duration, 'w%i' % duration)
+
+    def steps(self, batched=True, start=0):
+        '''Returns the steps of the method, read as they are executed, from a command on'''
+        return group_steps(self.actions(start), batched)
+
+
+def load_compiled(path, digest=None):
+    '''Opens a compiled method; with a digest, it must have been compiled for that processor'''
+    return CompiledMethod(path, digest)
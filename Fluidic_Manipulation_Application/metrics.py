@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Timers and counters of the planner
+
+A Metrics object keeps, for each phase of the planning, the number of times it
+ran, the total and the longest time, and counters such as the nodes expanded by
+the searches or the hits of the path cache. The phases of Planner.transfer() are:
+    avoid     blocking the avoided valves
+    check     checking the inputs, the output and the number of valves
+    groups    choosing the valves of each input
+    connect   opening the paths from the output to the groups (includes search)
+    search    searches of paths that were not in the cache
+    closing   ordering the valves to close (checking_closing)
+    routine   writing the commands of the routine
+    transfer  the whole transfer
+and write_routine() adds 'write' when it is given the metrics.
+
+With trace=True, every phase of every transfer is also kept as an event (up to
+trace_limit events), to see where a single slow transfer spent its time.
+
+The metrics can be appended to a JSON lines file, one line per export with the
+labels (for example the processor and the version of the software), to compare
+runs, and written as a Prometheus text file.
+
+"""
+#import the necessary libraries
+import os
+import time
+from collections import deque
+
+
+#Clock of one transfer: each lap records the time since the previous one as a phase
+class Clock:
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.metrics.record(phase, now - self.last, self.last)
+        self.last = now
+
+    def total(self, phase):
+        self.metrics.record(phase, time.perf_counter() - self.start, self.start)
+
+
+#Timer of a phase used in a with block
+class Timer:
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.record(self.phase, time.perf_counter() - self.start, self.start)
+
+
+#Timers, counters and trace of the planning
+class Metrics:
+    def __init__(self, labels=None, trace=False, trace_limit=100000):
+        self.labels = dict(labels or {})
+        self.trace = trace
+        self.events = deque(maxlen=trace_limit)
+        self.reset()
+
+    def reset(self):
+        #phase -> [calls, total seconds, longest seconds]
+        self.timers = {}
+        self.counters = {}
+        self.events.clear()
+        self.created = time.perf_counter()
+
+    def clock(self):
+        return Clock(self)
+
+    def timer(self, phase):
+        return Timer(self, phase)
+
+    def record(self, phase, seconds, start=None):
+        '''Adds the time of a phase'''
+        timer = self.timers.get(phase)
+        if timer is None:
+            self.timers[phase] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+        if self.trace:
+            offset = (start if start is not None else time.perf_counter() - seconds) - self.created
+            self.events.append({'t_ms': round(offset * 1000, 4), 'phase': phase, 'ms': round(seconds * 1000, 4),
+                                'transfer': self.counters.get('transfers', 0)})
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        '''Returns the timers (ms) and the counters as a dictionary'''
+        phases = {}
+        for phase, (calls, total, longest) in self.timers.items():
+            phases[phase] = {'calls': calls, 'total_ms': total * 1000, 'mean_ms': total * 1000 / calls, 'max_ms': longest * 1000}
+        return {'labels': dict(self.labels), 'phases': phases, 'counters': dict(self.counters)}
+
+    def export_jsonl(self, path):
+        '''Appends the metrics to a JSON lines file'''
+        import json
+        line = self.snapshot()
+        line['time'] = time.time()
+        with open(path, 'a') as out:
+            out.write(json.dumps(line, sort_keys=True) + '\n')
+
+    def export_trace(self, path):
+        '''Writes the events of the trace to a JSON lines file'''
+        import json
+        with open(path, 'w') as out:
+            for event in self.events:
+                out.write(json.dumps(event) + '\n')
+
+    def prometheus(self, prefix='fluidic_planner'):
+        '''Returns the metrics in the Prometheus text format'''
+        def labels(**extra):
+            values = dict(self.labels, **extra)
+            if not values:
+                return ''
+            return '{' + ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                                  for key, value in sorted(values.items())) + '}'
+
+        lines = []
+        for name, kind, help_text, column in (('phase_calls_total', 'counter', 'Times each phase ran', 0),
+                                              ('phase_seconds_total', 'counter', 'Time spent in each phase', 1),
+                                              ('phase_seconds_max', 'gauge', 'Longest time of each phase', 2)):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            for phase in sorted(self.timers):
+                lines.append('%s_%s%s %r' % (prefix, name, labels(phase=phase), self.timers[phase][column]))
+        for counter in sorted(self.counters):
+            lines.append('# TYPE %s_%s_total counter' % (prefix, counter))
+            lines.append('%s_%s_total%s %r' % (prefix, counter, labels(), self.counters[counter]))
+        return '\n'.join(lines) + '\n'
+
+    def export_prometheus(self, path):
+        '''Writes the metrics to a Prometheus text file (for the textfile collector)'''
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as out:
+            out.write(self.prometheus())
+        os.replace(temporary, path)
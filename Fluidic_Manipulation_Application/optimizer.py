@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Optimization of the commands of routines and methods
+
+The commands (o1, w300, c1...) are read as steps: the valves switched together
+and the wait after them. The optimization:
+    - merges the waits that follow each other (w300, w300 -> w600)
+    - removes the commands that do not change a valve (opening an open valve)
+and, if transients are allowed:
+    - removes a valve that is closed and opened again with no wait in between;
+      a valve closed and opened again after a wait is a pump cycle and is always
+      kept. This is also the case where two routines of a method meet, since
+      every command of a routine has its wait: the last valve closed by a routine
+      pushes the end of the mixture into the output, and the first valve opened
+      by the next routine draws the output again, so keeping the valve open
+      would deliver a plug of unmixed fluid instead (see the simulator)
+and, if asked (parallel, with the processor):
+    - switches in the same step the valves of consecutive steps that do not
+      affect each other, which is what shortens the methods made of routines.
+      The path of open valves that each command moves fluid through is found by
+      simulating the method (simulator.py); two commands are independent when
+      their paths do not share any node and each valve is farther from the other
+      one than the length of its own path, so neither one changes the path found
+      by the other. The commands of a step then give the same result in any
+      order, and at the same time. The step waits the longest of their waits.
+
+Without transients or parallel steps every valve is opened and closed at the
+same times, the same number of times (valve_intervals). With transients, a valve
+that was closed and opened again at the same time may stay open instead;
+equivalent() checks both. Parallel steps change the times of the valves, and
+same_fluids() checks them with the simulator instead: the optimized method, and
+the same method with the commands of each step in the reverse order, must move
+the same fluids as the original.
+
+usage: python optimizer.py Routines/Methods/method.txt --parallel --chip Processor_info
+
+"""
+#import the necessary libraries
+import argparse
+from fluidic_planner import heuristic
+from routines import read_method
+
+
+def read_steps(lists):
+    '''Separates the commands into steps: [commands, wait (ms)]'''
+    steps = []
+    actions = []
+    for item in lists:
+        if item.startswith('w'):
+            steps.append([actions, int(''.join(filter(str.isdigit, item)) or 0)])
+            actions = []
+        elif item.startswith('o') or item.startswith('c'):
+            actions.append(item)
+    if actions:
+        steps.append([actions, 0])
+    return steps
+
+
+def write_steps(steps):
+    '''Joins the steps into commands again'''
+    lists = []
+    for actions, wait in steps:
+        lists.extend(actions)
+        if wait:
+            lists.append('w' + str(wait))
+    return lists
+
+
+def runtime(lists):
+    '''Estimated duration of the commands (ms): the sum of the waits'''
+    return sum(wait for actions, wait in read_steps(lists))
+
+
+def valve_intervals(lists, allow_transients=False):
+    '''Returns the times (ms) when each valve is opened and closed, {valve: [(opened, closed)]},
+    with closed None for a valve open at the end; with transients, a valve closed and
+    opened again at the same time is kept open'''
+    intervals = {}
+    opened = {}
+    now = 0
+    for actions, wait in read_steps(lists):
+        for item in actions:
+            valve = item[1:]
+            if item.startswith('o'):
+                if valve in opened:
+                    continue
+                previous = intervals.get(valve)
+                if allow_transients and previous and previous[-1][1] == now:
+                    opened[valve] = previous.pop()[0]
+                else:
+                    opened[valve] = now
+            elif valve in opened:
+                intervals.setdefault(valve, []).append((opened.pop(valve), now))
+        now += wait
+    for valve, start in opened.items():
+        intervals.setdefault(valve, []).append((start, None))
+    return {valve: times for valve, times in intervals.items() if times}
+
+
+def equivalent(original, optimized, allow_transients=False):
+    '''Checks if every valve is opened and closed the same number of times and at the same
+    times in the optimized commands as in the original; with transients, a valve that was
+    closed and opened again at the same time may stay open instead'''
+    return valve_intervals(original, allow_transients) == valve_intervals(optimized, allow_transients)
+
+
+def _drop_redundant(steps):
+    state = set()
+    result = []
+    for actions, wait in steps:
+        kept = []
+        for item in actions:
+            valve = item[1:]
+            if item.startswith('o') and valve not in state:
+                state.add(valve)
+                kept.append(item)
+            elif item.startswith('c') and valve in state:
+                state.discard(valve)
+                kept.append(item)
+        #the wait of a step without commands left is joined to the previous one
+        result.append([kept, wait])
+    return result
+
+
+def _cancel_pairs(steps):
+    result = []
+    for actions, wait in steps:
+        #the commands of a step without a wait are switched together with the next ones
+        if result and result[-1][1] == 0:
+            actions = result.pop()[0] + list(actions)
+        kept = []
+        for item in actions:
+            valve = item[1:]
+            if item.startswith('o'):
+                #the last command of the valve at this time closed it
+                last = [i for i, other in enumerate(kept) if other[1:] == valve]
+                if last and kept[last[-1]] == 'c' + valve:
+                    del kept[last[-1]]
+                    continue
+            kept.append(item)
+        result.append([kept, wait])
+    return result
+
+
+def _parallel(steps, my_processor):
+    from simulator import Simulator
+    commands = [item for actions, wait in steps for item in actions]
+    paths = Simulator(my_processor).run(commands, paths=True).paths
+    result = []
+    #paths of the commands of the last step
+    group = None
+    index = 0
+    for actions, wait in steps:
+        moves = [paths.get(i) for i in range(index, index + len(actions))]
+        index += len(actions)
+        if None in moves:
+            #a command that could not move fluid is left in its own step
+            result.append([list(actions), wait])
+            group = None
+        elif actions and group is not None and all(_independent(path, other) for path in moves for other in group):
+            result[-1][0].extend(actions)
+            result[-1][1] = max(result[-1][1], wait)
+            group.extend(moves)
+        else:
+            result.append([list(actions), wait])
+            group = moves if actions else None
+    return result
+
+
+def _independent(path, other):
+    '''Two commands can be switched together when their paths do not meet and neither
+    valve is close enough to change the path found by the other one'''
+    if not set(path).isdisjoint(other):
+        return False
+    distance = heuristic(path[0], other[0])
+    return distance >= len(path) and distance >= len(other)
+
+
+def _merge_waits(steps):
+    result = []
+    for actions, wait in steps:
+        if not actions and result:
+            result[-1][1] += wait
+        else:
+            result.append([list(actions), wait])
+    return result
+
+
+def optimize(lists, my_processor=None, allow_transients=False, parallel=False):
+    '''Returns the optimized commands of a routine or method; switching valves in the same
+    step (parallel) needs the processor and changes the times of the valves'''
+    steps = _drop_redundant(read_steps(lists))
+    if allow_transients:
+        steps = _cancel_pairs(steps)
+    if parallel:
+        if my_processor is None:
+            raise ValueError('Switching valves together needs the processor')
+        steps = _parallel(_merge_waits(steps), my_processor)
+    return write_steps(_merge_waits(steps))
+
+
+def same_fluids(original, optimized, my_processor):
+    '''Checks with the simulator that the optimized commands move the same fluids as the
+    original ones, also when the commands of each step are switched in the reverse order'''
+    from simulator import Simulator
+    simulator = Simulator(my_processor)
+    reverse = [item for actions, wait in read_steps(optimized) for item in actions[::-1] + ['w%i' % wait]]
+    expected = simulator.run(original)
+    for lists in (optimized, reverse):
+        result = simulator.run(lists)
+        if (result.received, result.drawn, result.chambers) != (expected.received, expected.drawn, expected.chambers):
+            return False
+        if len(result.errors()) != len(expected.errors()):
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Optimizes the commands of a method')
+    parser.add_argument('method', help='method file (Routines/Methods/...)')
+    parser.add_argument('--chip', help='folder with the processor information, needed by --parallel')
+    parser.add_argument('--transients', action='store_true', help='keeps open a valve closed and opened again at the same time')
+    parser.add_argument('--parallel', action='store_true', help='switches independent valves together (changes the timing)')
+    parser.add_argument('--out', help='file where the optimized method is saved')
+    args = parser.parse_args(argv)
+    if args.parallel and args.chip is None:
+        parser.error('--parallel needs --chip')
+
+    my_processor = None
+    if args.chip is not None:
+        from fluidic_planner import load_processor
+        my_processor = load_processor(args.chip)
+
+    lists = read_method(args.method)
+    optimized = optimize(lists, my_processor, args.transients, args.parallel)
+    print('%i commands, %.1f s -> %i commands, %.1f s (equivalent: %s)' % (
+        len(lists), runtime(lists) / 1000, len(optimized), runtime(optimized) / 1000,
+        equivalent(lists, optimized, args.transients)))
+    if my_processor is not None:
+        print('same fluids in the simulator: %s' % same_fluids(lists, optimized, my_processor))
+
+    if args.out is not None:
+        with open(args.out, 'w') as out:
+            out.write(' '.join(optimized) + ' ')
+
+
+if __name__ == '__main__':
+    main()
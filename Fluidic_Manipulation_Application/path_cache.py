@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of the shortest paths found in a processor
+
+The paths only change when the topology of the processor changes, that is, when
+the set of blocked valves or blocked perimeter valves changes. For each
+(chip, blocked valves, blocked perimeter, start) the cache keeps the complete
+Dijkstra tree from the start node, so any goal reached from that start is
+answered without a new search. The searches between two nodes (A* and
+bidirectional A*) keep the path, with the goal and the backend in the key.
+
+"""
+#import the necessary libraries
+from collections import OrderedDict
+
+
+#Least recently used cache with hit / miss counters
+class PathCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._trees = OrderedDict()
+
+    def __len__(self):
+        return len(self._trees)
+
+    @staticmethod
+    def key(graph, start, goal=None, search='dijkstra'):
+        '''Key of the search tree of a node (or of the path to a goal) in the current topology of the processor'''
+        return (graph.model.digest, graph.blocked_valves_mask, graph.blocked_perimeter_mask, start, goal, search)
+
+    def get(self, key):
+        '''Returns the tree stored with a key, or None when it is not in the cache'''
+        tree = self._trees.get(key)
+        if tree is None:
+            self.misses += 1
+            return None
+        self._trees.move_to_end(key)
+        self.hits += 1
+        return tree
+
+    def put(self, key, tree):
+        '''Stores a tree, removing the least recently used one if the cache is full'''
+        self._trees[key] = tree
+        self._trees.move_to_end(key)
+        while len(self._trees) > self.maxsize:
+            self._trees.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._trees.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self):
+        '''Returns the counters of the cache'''
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._trees), 'maxsize': self.maxsize}
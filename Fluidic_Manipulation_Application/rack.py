@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Several processors, each one on its own board, driven from one process
+
+A Station is one processor with its own grid (Planner), pins and connection to
+its board. A Rack holds several stations and runs a method on each of them at
+the same time: every method runs in its own MethodExecutor thread, with its own
+timing, and the progress of all of them arrives in a single queue as
+(station, event, step, total, command).
+
+The stations of a rack are listed in a text file, one per line:
+    Name | Processor folder | Port
+for example
+    left  | Processor_info_3x3 | /dev/ttyACM0
+    right | Processor_info_4x4 | /dev/ttyACM1
+The folders are relative to the rack file. Without a port, the port of the
+processor is used (port.txt, as in board_connection.py). Empty lines and lines
+starting with # are ignored.
+
+usage: python rack.py rack.txt --method left=Routines/Methods/mix.txt --method right=Routines/Methods/wash.txt
+
+"""
+#import the necessary libraries
+import argparse
+import os
+import queue
+import sys
+import time
+from fluidic_planner import Planner
+from board_connection import BoardConnection, arduino_mega, load_port
+from execution import MethodExecutor, PinError, check_pins
+from telemetry import Telemetry
+
+
+#Error raised when the stations of a rack cannot be used together
+class RackError(Exception):
+    pass
+
+
+#Queue of a station: adds the name of the station to the events of its executor
+class StationEvents:
+    def __init__(self, name, events):
+        self.name = name
+        self.events = events
+
+    def put(self, event):
+        self.events.put((self.name,) + tuple(event))
+
+
+#One processor with its pins and its board
+class Station:
+    def __init__(self, folder, port=None, name=None, connect=True, factory=arduino_mega):
+        self.folder = folder
+        self.name = name or os.path.basename(os.path.normpath(folder))
+        self.planner = Planner(folder)
+        self.processor = self.planner.processor
+        self.pins = self.planner.pins
+        self.port = port or load_port(folder)
+        #without a connection the methods are only logged (dry run)
+        self.connection = BoardConnection(self.port, factory) if connect else None
+        self.executor = None
+
+    def __repr__(self):
+        return 'Station(%r, %r, port=%r)' % (self.name, self.folder, self.port)
+
+    @property
+    def busy(self):
+        return self.executor is not None and self.executor.is_alive()
+
+    def run(self, lists, events=None, batched=False, telemetry=None, log=None):
+        '''Starts a method in the board of the station; returns its MethodExecutor'''
+        if self.busy:
+            raise RackError('A method is already running in %s' % self.name)
+        self.executor = MethodExecutor(lists, self.pins, connection=self.connection, events=events,
+                                       log=log, batched=batched, telemetry=telemetry)
+        self.executor.start()
+        return self.executor
+
+    def close(self):
+        '''Aborts the method that is running and closes the connection to the board'''
+        if self.busy:
+            self.executor.abort()
+            self.executor.join()
+        if self.connection is not None:
+            self.connection.close()
+
+
+#Stations driven together
+class Rack:
+    def __init__(self, stations):
+        self.stations = {}
+        ports = {}
+        for station in stations:
+            if station.name in self.stations:
+                raise RackError('There are two stations called %s' % station.name)
+            if station.connection is not None:
+                if station.port in ports:
+                    raise RackError('%s and %s use the same port (%s)' % (ports[station.port], station.name, station.port))
+                ports[station.port] = station.name
+            self.stations[station.name] = station
+        #(station, event, step, total, command) of all the stations
+        self.events = queue.Queue()
+
+    def __getitem__(self, name):
+        return self.stations[name]
+
+    def __len__(self):
+        return len(self.stations)
+
+    def run(self, methods, batched=False, telemetry_folder=None, log=None):
+        '''Starts the methods {station: commands} at the same time; returns {station: MethodExecutor}'''
+        unknown = [name for name in methods if name not in self.stations]
+        if unknown:
+            raise RackError('There is no station called %s' % ', '.join(unknown))
+        busy = [name for name in methods if self.stations[name].busy]
+        if busy:
+            raise RackError('A method is already running in %s' % ', '.join(busy))
+        #no station starts if the method of another one cannot run
+        for name, lists in methods.items():
+            try:
+                check_pins(lists, self.stations[name].pins)
+            except PinError as error:
+                raise RackError('%s: %s' % (name, error))
+
+        executors = {}
+        for name, lists in methods.items():
+            station = self.stations[name]
+            telemetry = None
+            if telemetry_folder is not None:
+                os.makedirs(telemetry_folder, exist_ok=True)
+                path = os.path.join(telemetry_folder, '%s_%s.log' % (name, time.strftime('%Y%m%d_%H%M%S')))
+                telemetry = Telemetry(path, labels={'station': name, 'port': station.port, 'batched': batched})
+            station_log = None
+            if log is not None:
+                station_log = lambda *values, name=name: log(name, *values)
+            executors[name] = station.run(lists, StationEvents(name, self.events), batched, telemetry, station_log)
+        return executors
+
+    def running(self):
+        return [name for name, station in self.stations.items() if station.busy]
+
+    def wait(self, timeout=None):
+        '''Waits for the methods to end; returns False if some are still running after the timeout'''
+        end = None if timeout is None else time.monotonic() + timeout
+        for station in self.stations.values():
+            if station.executor is not None:
+                station.executor.join(None if end is None else max(end - time.monotonic(), 0))
+        return not self.running()
+
+    def pause(self, *names):
+        for name in names or self.running():
+            if self.stations[name].busy:
+                self.stations[name].executor.pause()
+
+    def resume(self, *names):
+        for name in names or self.running():
+            if self.stations[name].busy:
+                self.stations[name].executor.resume()
+
+    def abort(self, *names):
+        '''Stops the methods (all of them by default) and closes their valves'''
+        for name in names or self.running():
+            if self.stations[name].busy:
+                self.stations[name].executor.abort()
+
+    def close(self):
+        for station in self.stations.values():
+            station.close()
+
+
+def load_rack(path, connect=True, factory=arduino_mega):
+    '''Builds the rack described in a file'''
+    folder = os.path.dirname(os.path.abspath(path))
+    stations = []
+    with open(path, 'r') as inf:
+        for line in inf:
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = [field.strip() for field in line.split('|')]
+            if len(fields) < 2:
+                raise RackError('Expected Name | Processor folder | Port, found %s' % line.strip())
+            fields.extend([''] * (3 - len(fields)))
+            name, chip, port = fields[:3]
+            stations.append(Station(os.path.join(folder, chip), port or None, name or None, connect, factory))
+    return Rack(stations)
+
+
+def main(argv=None):
+    from routines import read_method
+    parser = argparse.ArgumentParser(description='Runs methods in several processors at the same time')
+    parser.add_argument('rack', help='file with one station per line: Name | Processor folder | Port')
+    parser.add_argument('--method', action='append', default=[], metavar='STATION=FILE', help='method run in a station')
+    parser.add_argument('--dry-run', action='store_true', help='logs the methods without connecting to the boards')
+    parser.add_argument('--batched', action='store_true', help='switches the valves without a wait between them together')
+    parser.add_argument('--telemetry', help='folder where the timing of the valves of each station is saved')
+    parser.add_argument('--verbose', action='store_true', help='prints every valve switched')
+    args = parser.parse_args(argv)
+
+    rack = load_rack(args.rack, connect=not args.dry_run)
+    methods = {}
+    for item in args.method:
+        name, _, path = item.partition('=')
+        methods[name] = read_method(path)
+
+    log = (lambda name, *values: print(name, *values)) if args.verbose else None
+    failed = 0
+    try:
+        rack.run(methods, args.batched, args.telemetry, log)
+        ended = 0
+        while ended < len(methods):
+            name, event, step, total, item = rack.events.get()
+            if event in ('finished', 'aborted', 'error'):
+                ended += 1
+                failed += event != 'finished'
+            if event != 'step' or args.verbose:
+                print('%-12s %-9s %i of %i%s' % (name, event, step, total, '' if item is None else ' (%s)' % item))
+    except KeyboardInterrupt:
+        rack.abort()
+        rack.wait()
+        failed += 1
+    finally:
+        rack.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
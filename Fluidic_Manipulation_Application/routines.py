@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Reading routines and assembling them into methods
+
+A routine is the file saved by transfer() and a method is the list of commands
+(o1, w300, c1...) of several routines, saved in Routines/Methods and executed
+by the Arduino tab of the application.
+
+The parsed routines can be kept in a RoutineCache, so building a method from
+routines that were already read only joins their lists of commands.
+
+A TextMethod reads the commands of a method file as they are executed, in
+blocks, so a method with millions of commands does not have to fit in memory.
+
+"""
+#import the necessary libraries
+import itertools
+import os
+import pickle
+import re
+from collections import OrderedDict
+from execution import group_steps, missing_pins, parse_actions
+
+
+def read_routine(path):
+    '''Reads a routine file and returns its list of commands, with the waiting times included'''
+    with open(path, 'r') as file_object1:
+        info1 = file_object1.readlines()
+    without_stuff = (info1[1].split('SetDefault',)[1])[:-1]
+    separated_into_commands = re.split(r'[,]+', without_stuff)
+    Waitingtime = separated_into_commands.pop(0)
+    Waiting_time =int(''.join(filter(str.isdigit, Waitingtime)))
+
+    new = []
+    for item in separated_into_commands:
+        item = item.strip()
+
+        if item.startswith('w'):
+            thing = item+str(Waiting_time)
+            new.append(thing)
+        else:
+            new.append(item)
+
+    return new
+
+
+#Cache of parsed routines, keyed on the path, the modification time and the size of the file
+#The most recently used routines are kept in memory and, optionally, in a file (store)
+#that is read when the cache is created and written by save()
+class RoutineCache:
+    def __init__(self, maxsize=4096, store=None):
+        self.maxsize = maxsize
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._routines = OrderedDict()
+        self._changed = False
+        if store is not None and os.path.exists(store):
+            try:
+                with open(store, 'rb') as inf:
+                    self._routines.update(pickle.load(inf))
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+                self._routines.clear()
+
+    def __len__(self):
+        return len(self._routines)
+
+    def read(self, path):
+        '''Returns the commands of a routine, parsing the file only if it changed'''
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._routines.get(path)
+        if entry is not None and entry[0] == version:
+            self._routines.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        commands = tuple(read_routine(path))
+        self._routines[path] = (version, commands)
+        self._routines.move_to_end(path)
+        while len(self._routines) > self.maxsize:
+            self._routines.popitem(last=False)
+        self._changed = True
+        return commands
+
+    def save(self):
+        '''Writes the cache in its store file'''
+        if self.store is None or not self._changed:
+            return
+        temporary = self.store + '.tmp'
+        with open(temporary, 'wb') as out:
+            pickle.dump(dict(self._routines), out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.store)
+        self._changed = False
+
+    def info(self):
+        '''Returns the counters of the cache'''
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._routines), 'maxsize': self.maxsize}
+
+
+def assemble_method(paths, cache=None):
+    '''Joins the commands of several routines, in order, into a method'''
+    final_process = []
+    for path in paths:
+        final_process.extend(read_routine(path) if cache is None else cache.read(path))
+    return final_process
+
+
+def write_method(final_process, folder, name, catalogue=None, chip=None):
+    '''Saves a method in a folder, without replacing other methods,
+    and returns the name of the file;
+    with a catalogue (catalogue.py) of the folder, the name is given by the catalogue'''
+    if catalogue is not None:
+        name = catalogue.allocate(name)
+    else:
+        i=1
+        while os.path.exists(os.path.join(folder, name + ".txt")) == True:
+            name = name + '(' + str(i) + ')'
+            i = i+1
+
+    with open(os.path.join(folder, name + ".txt"), "w") as file2:
+        for item in final_process:
+            file2.write (item)
+            file2.write (' ')
+
+    if catalogue is not None:
+        catalogue.add(name, final_process, chip)
+
+    return name + ".txt"
+
+
+def read_method(path):
+    '''Reads the list of commands of a method file'''
+    with open(path, 'r') as fp:
+        return [list(map(str, line.strip().split(' '))) for line in fp][0]
+
+
+def stream_method(path, block=65536):
+    '''Returns the commands of a method file one by one, reading the file in blocks'''
+    with open(path, 'r') as fp:
+        rest = ''
+        while True:
+            data = fp.read(block)
+            if not data:
+                break
+            data = rest + data
+            items = data.split()
+            #the last command can continue in the next block
+            rest = items.pop() if items and not data[-1].isspace() else ''
+            for item in items:
+                yield item
+        if rest:
+            yield rest
+
+
+#Method file read as it is executed, as the compiled methods (method_format.py)
+class TextMethod:
+    def __init__(self, path, Python_to_arduino, block=65536):
+        self.path = path
+        self.Python_to_arduino = Python_to_arduino
+        self.block = block
+        self._count = None
+
+    def __len__(self):
+        '''Number of commands of the method (the file is read once to count them)'''
+        if self._count is None:
+            self._count = sum(1 for action in parse_actions(stream_method(self.path, self.block), self.Python_to_arduino))
+        return self._count
+
+    def missing_pins(self):
+        '''Valves of the method that have no pin in the board (the file is read once)'''
+        return missing_pins(stream_method(self.path, self.block), self.Python_to_arduino)
+
+    def actions(self, start=0):
+        '''Returns the actions of the method (execution.parse_actions()), from a command on'''
+        return itertools.islice(parse_actions(stream_method(self.path, self.block), self.Python_to_arduino), start, None)
+
+    def steps(self, batched=True, start=0):
+        '''Returns the steps of the method, read as they are executed'''
+        return group_steps(self.actions(start), batched)
+
+    def close(self):
+        pass
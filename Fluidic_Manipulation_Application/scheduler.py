@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Scheduler of several transfers in the same processor
+
+Each entry of a routine (o5,w, / c5,w,) is one step: one valve is switched and
+the processor waits. A valve used by a transfer is reserved from the step it is
+opened until the step it is closed, and two transfers cannot use the same valve,
+or two neighboring valves (the fluid would pass from one to the other), at the
+same time. The transfers are placed one by one, each at the first step where
+none of its reservations conflicts with the transfers already placed (a space-time
+reservation table), and the steps of the transfers that run together are merged
+into a single routine.
+
+The merged routine waits, after each step, the longest waiting time of the
+transfers, so its duration (makespan) is
+    steps of the schedule x longest waiting time
+while running the transfers one after another takes
+    sum of the steps x waiting time of each transfer
+
+"""
+#import the necessary libraries
+from fluidic_planner import Plan
+
+
+def routine_steps(plan):
+    '''Returns the commands of each step of a plan (['o5'], ['c5']...); the plan
+    without inputs has a single step without commands'''
+    steps = []
+    for item in plan.routine:
+        commands = [command.strip() for command in item.split(',')]
+        steps.append([command for command in commands if command != '' and command != 'w'])
+    return steps
+
+
+def reservations(plan, model):
+    '''Returns the steps in which each valve of a plan is in use: {node: (first, last)};
+    a valve left open is in use until the end of the plan'''
+    first = {}
+    last = {}
+    left_open = {}
+    for i, commands in enumerate(routine_steps(plan)):
+        for command in commands:
+            node = model.position(command[1:])
+            first.setdefault(node, i)
+            last[node] = i
+            left_open[node] = command.startswith('o')
+    for node, is_open in left_open.items():
+        if is_open:
+            last[node] = len(plan.routine) - 1
+    return {node: (first[node], last[node]) for node in first}
+
+
+#Result of the scheduling of several plans
+class Schedule:
+    def __init__(self, plans, starts, steps, wait):
+        self.plans = plans
+        #step in which each plan starts
+        self.starts = starts
+        #commands of each step of the merged routine
+        self.steps = steps
+        self.wait = wait
+
+    def __repr__(self):
+        return 'Schedule(transfers=%i, steps=%i, makespan=%i ms, serial=%i ms)' % (
+            len(self.plans), len(self.steps), self.makespan, self.serial)
+
+    @property
+    def makespan(self):
+        '''Duration of the merged routine (ms)'''
+        return len(self.steps) * self.wait
+
+    @property
+    def serial(self):
+        '''Duration of the plans run one after another (ms)'''
+        return sum(len(plan.routine) * plan.wait for plan in self.plans)
+
+    @property
+    def speedup(self):
+        return self.serial / self.makespan if self.makespan else 1.0
+
+    def plan(self):
+        '''Returns the merged routine as a Plan, that can be saved with write_routine()'''
+        routine = []
+        for commands in self.steps:
+            routine.append(''.join(command + ',' for command in commands) + 'w,')
+        if routine:
+            routine[-1] = routine[-1][:-1]
+
+        inputs = {}
+        outputs = []
+        groups = {}
+        for plan in self.plans:
+            for key, value in plan.inputs.items():
+                inputs[key] = inputs.get(key, 0) + value
+            if plan.output not in outputs:
+                outputs.append(plan.output)
+            for key, value in plan.groups.items():
+                groups.setdefault(key, []).extend(value)
+        return Plan(','.join(str(output) for output in outputs if output != ''), inputs, self.wait, routine, groups)
+
+
+#Space-time reservation table of the valves of a processor
+class Scheduler:
+    def __init__(self, model):
+        self.model = model
+        #nodes that cannot be used together with each node: itself and its neighbors
+        self.conflicts = {}
+        for node, neighbors in model.adjacent.items():
+            self.conflicts.setdefault(node, set()).add(node)
+            for neighbor in neighbors:
+                self.conflicts[node].add(neighbor)
+                self.conflicts.setdefault(neighbor, set()).add(node)
+
+    def _first_start(self, reserved, table):
+        '''Returns the first step where a plan with these reservations can start'''
+        start = 0
+        moved = True
+        while moved:
+            moved = False
+            for node, (first, last) in reserved.items():
+                for other in self.conflicts.get(node, (node,)):
+                    for begin, end in table.get(other, ()):
+                        if start + first <= end and begin <= start + last:
+                            start = end + 1 - first
+                            moved = True
+        return start
+
+    def schedule(self, plans):
+        '''Places the plans, in order, at the first steps free of conflicts and merges them'''
+        plans = list(plans)
+        table = {}
+        starts = []
+        length = 0
+        for plan in plans:
+            reserved = reservations(plan, self.model)
+            start = self._first_start(reserved, table)
+            for node, (first, last) in reserved.items():
+                table.setdefault(node, []).append((start + first, start + last))
+            starts.append(start)
+            length = max(length, start + len(plan.routine))
+
+        steps = [[] for i in range(length)]
+        for plan, start in zip(plans, starts):
+            for i, commands in enumerate(routine_steps(plan)):
+                steps[start + i].extend(commands)
+
+        wait = max([plan.wait for plan in plans], default=0)
+        return Schedule(plans, starts, steps, wait)
+
+
+def schedule_transfers(planner, transfers):
+    '''Plans several transfers ((inputs, output, avoid_valves, wait)) in a processor
+    and schedules them together'''
+    plans = [planner.transfer(inputs, output, avoid_valves, wait) for inputs, output, avoid_valves, wait in transfers]
+    return Scheduler(planner.processor.model).schedule(plans)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Search backends for the paths between two nodes of a processor
+
+Each backend returns the path (as reconstruct_path()) and the number of nodes
+expanded to find it:
+    dijkstra       dijkstra_search() with a goal: grows uniformly from the start
+    astar          A*, guided by heuristic(), the Manhattan distance to the goal
+    bidirectional  A* from the start and from the goal at the same time, until
+                   the best path through a node reached by both is proven optimal
+The Manhattan distance never overestimates the cost of a path in the grid while
+no node of the processor has a weight smaller than 1, so the three backends find
+paths with the same (smallest) cost; when several paths have that cost, they
+can choose different ones.
+
+"""
+#import the necessary libraries
+import heapq
+from fluidic_planner import PlanningError, heuristic, reconstruct_path
+
+INFINITY = float('inf')
+
+
+def _no_path(start, goal):
+    return PlanningError('There is no fluidic path between %s and %s' % (start, goal))
+
+
+def dijkstra_path(graph, start, goal):
+    '''Dijkstra search that stops when the goal is reached'''
+    frontier = [(0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+    expanded = 0
+    while frontier:
+        cost, current = heapq.heappop(frontier)
+        if cost > cost_so_far[current]:
+            continue
+        expanded += 1
+        if current == goal:
+            break
+        for next in graph.neighbors(current):
+            new_cost = cost + graph.cost(current, next)
+            if next not in cost_so_far or new_cost < cost_so_far[next]:
+                cost_so_far[next] = new_cost
+                came_from[next] = current
+                heapq.heappush(frontier, (new_cost, next))
+    return reconstruct_path(came_from, start, goal), expanded
+
+
+def astar_path(graph, start, goal):
+    '''A* search with the Manhattan distance to the goal'''
+    frontier = [(heuristic(start, goal), 0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+    closed = set()
+    expanded = 0
+    while frontier:
+        priority, cost, current = heapq.heappop(frontier)
+        if current in closed:
+            continue
+        closed.add(current)
+        expanded += 1
+        if current == goal:
+            break
+        for next in graph.neighbors(current):
+            new_cost = cost_so_far[current] + graph.cost(current, next)
+            if next not in cost_so_far or new_cost < cost_so_far[next]:
+                cost_so_far[next] = new_cost
+                came_from[next] = current
+                #between equal priorities, the node closer to the goal first
+                heapq.heappush(frontier, (new_cost + heuristic(next, goal), -new_cost, next))
+    return reconstruct_path(came_from, start, goal), expanded
+
+
+def bidirectional_path(graph, start, goal, previous=None):
+    '''Bidirectional A*: from the start with the distance to the goal and from the goal
+    with the distance to the start; previous gives the nodes that have each node as a neighbor
+    (incremental.predecessors()), which the caller should keep between searches of the same processor'''
+    if start == goal:
+        return [start], 1
+    if previous is None:
+        from incremental import predecessors
+        previous = predecessors(graph.model)
+    blocked = graph.blocked_valves_mask | graph.blocked_perimeter_mask
+    bit_at = graph.model.bit_at
+
+    def backward_neighbors(node):
+        #the edges that arrive at a blocked node are not used from the start
+        if blocked & bit_at.get(node, 0) and node != start:
+            return ()
+        return previous.get(node, ())
+
+    cost = ({start: 0}, {goal: 0})
+    came = ({start: None}, {goal: None})
+    closed = (set(), set())
+    frontier = ([(heuristic(start, goal), start)], [(heuristic(goal, start), goal)])
+    targets = (goal, start)
+    best = INFINITY
+    meeting = None
+    expanded = 0
+
+    while frontier[0] and frontier[1]:
+        #the best path is optimal when no node left can be part of a shorter one
+        if best <= max(frontier[0][0][0], frontier[1][0][0]):
+            break
+        side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+        priority, current = heapq.heappop(frontier[side])
+        if current in closed[side]:
+            continue
+        closed[side].add(current)
+        expanded += 1
+
+        if side == 0:
+            neighbors = [(next, graph.cost(current, next)) for next in graph.neighbors(current)]
+        else:
+            neighbors = [(next, graph.cost(next, current)) for next in backward_neighbors(current)]
+        for next, step in neighbors:
+            new_cost = cost[side][current] + step
+            if next not in cost[side] or new_cost < cost[side][next]:
+                cost[side][next] = new_cost
+                came[side][next] = current
+                heapq.heappush(frontier[side], (new_cost + heuristic(next, targets[side]), next))
+                if next in cost[1 - side] and new_cost + cost[1 - side][next] < best:
+                    best = new_cost + cost[1 - side][next]
+                    meeting = next
+
+    if meeting is None:
+        raise _no_path(start, goal)
+
+    path = reconstruct_path(came[0], start, meeting)
+    node = came[1][meeting]
+    while node is not None:
+        path.append(node)
+        node = came[1][node]
+    return path, expanded
+
+
+SEARCHES = {'dijkstra': dijkstra_path, 'astar': astar_path, 'bidirectional': bidirectional_path}
+
+
+def path_cost(graph, path):
+    '''Cost of a path in a grid'''
+    return sum(graph.cost(a, b) for a, b in zip(path, path[1:]))
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Simulation of routines and methods in the model of a processor, without the board
+
+The commands (o<valve>, c<valve>, w<ms>) are executed against the grid of the
+processor, without waiting: the waits only add to the elapsed time. Each valve
+has a chamber that holds one unit of volume when the valve is open and none when
+it is closed, and the fluid moves as plugs of one chamber:
+    opening   the valve draws one chamber of fluid through the closest path of
+              open valves from a reservoir (a perimeter valve draws directly
+              from its reservoir); every chamber of the path passes its fluid
+              to the next one towards the valve
+    closing   the valve pushes its fluid through the closest path of open
+              valves into a reservoir; the chamber next to the reservoir
+              empties into it
+So each open chamber holds the fluid of a single reservoir, and the volumes
+moved into each reservoir give the ratio of the mixture made by a transfer.
+
+Invalid states are flagged (the simulation goes on):
+    unknown     a valve that is not in the processor
+    blocked     opening a valve that should be avoided
+    no path     opening a valve with no path of open valves to a reservoir (it
+                cannot draw any fluid)
+    trapped     closing a valve with no path of open valves to a reservoir (its
+                fluid has nowhere to go)
+    empty       drawing from a reservoir with less volume than a chamber
+and, as warnings, opening an open valve, closing a closed one and leaving valves
+open at the end.
+
+A Simulator is built once for a processor and simulates any number of methods;
+simulate_batch() simulates many of them, in a pool of processes if asked.
+
+usage: python simulator.py Routines/Methods/mix.txt Routines/mix_1.py --chip Processor_info
+
+"""
+#import the necessary libraries
+import argparse
+import multiprocessing
+import os
+import sys
+from collections import deque
+
+ERRORS = ('unknown', 'blocked', 'no path', 'trapped', 'empty')
+
+#simulator of each process of the pool
+_simulator = None
+
+
+#Result of the simulation of a method
+class Simulation:
+    def __init__(self):
+        self.elapsed = 0
+        self.actuations = 0
+        #(command index, command, kind, message)
+        self.flags = []
+        #{reservoir: {source reservoir: volume}} received and {reservoir: volume} drawn
+        self.received = {}
+        self.drawn = {}
+        #fluid in the chamber of each open valve at the end: {valve: source reservoir or None}
+        self.chambers = {}
+        self.volumes = {}
+        #nodes that each command moved fluid through, from its valve to the reservoir: {command index: [nodes]}
+        self.paths = {}
+
+    def __repr__(self):
+        return 'Simulation(valid=%s, elapsed=%i ms, actuations=%i, flags=%i)' % (
+            self.valid, self.elapsed, self.actuations, len(self.flags))
+
+    @property
+    def valid(self):
+        return not any(kind in ERRORS for index, command, kind, message in self.flags)
+
+    def errors(self):
+        return [flag for flag in self.flags if flag[2] in ERRORS]
+
+    def net(self, reservoir):
+        '''Volume of each source that ended in a reservoir (negative for the volume that left it)'''
+        net = dict(self.received.get(reservoir, {}))
+        own = net.get(reservoir, 0) - self.drawn.get(reservoir, 0)
+        net.pop(reservoir, None)
+        if own:
+            net[reservoir] = own
+        return {source: volume for source, volume in net.items() if volume}
+
+
+#Executes commands in the model of a processor
+class Simulator:
+    def __init__(self, my_processor, blocked=(), chamber=1.0, switch_ms=0):
+        model = my_processor.model
+        self.model = model
+        self.adjacent = model.adjacent
+        self.chamber = chamber
+        #time taken by each valve to open or close (ms)
+        self.switch_ms = switch_ms
+        self.blocked = set(str(name) for name in blocked)
+        #node of each valve (processor and perimeter valves)
+        self.node_of = {name: model.position(name) for name in model.names}
+        self.name_at = {node: name for name, node in self.node_of.items()}
+        #reservoir next to each perimeter valve
+        reservoir_at = {node: name for name, node in model.reservoirs.items()}
+        self.reservoir_of = {}
+        for node in model.perimeter_cells:
+            for neighbor in self.adjacent.get(node, ()):
+                if neighbor in reservoir_at:
+                    self.reservoir_of[node] = reservoir_at[neighbor]
+                    break
+        #parsed commands, since the same ones repeat many times
+        self._parsed = {}
+
+    def _parse(self, item):
+        parsed = self._parsed.get(item)
+        if parsed is None:
+            digits = ''.join(filter(str.isdigit, item))
+            if item.startswith('w'):
+                parsed = ('w', int(digits or 0))
+            elif item.startswith('o') or item.startswith('c'):
+                parsed = (item[0], digits)
+            else:
+                parsed = ('', None)
+            self._parsed[item] = parsed
+        return parsed
+
+    def _path(self, node, content):
+        '''Closest path of open valves from a node to a reservoir: (nodes, reservoir) or None'''
+        reservoir = self.reservoir_of.get(node)
+        if reservoir is not None:
+            return [node], reservoir
+        came_from = {node: None}
+        frontier = deque([node])
+        while frontier:
+            current = frontier.popleft()
+            for neighbor in self.adjacent[current]:
+                if neighbor in came_from or neighbor not in content:
+                    continue
+                came_from[neighbor] = current
+                reservoir = self.reservoir_of.get(neighbor)
+                if reservoir is not None:
+                    path = [neighbor]
+                    while came_from[path[-1]] is not None:
+                        path.append(came_from[path[-1]])
+                    path.reverse()
+                    return path, reservoir
+                frontier.append(neighbor)
+        return None
+
+    def run(self, lists, volumes=None, paths=False):
+        '''Simulates the commands of a routine or a method; volumes gives the initial
+        volume of the reservoirs that are not unlimited, and with paths the nodes that
+        each command moved fluid through are kept'''
+        result = Simulation()
+        result.volumes = dict(volumes or {})
+        #fluid in each open chamber (source reservoir, or None if it could not draw any)
+        content = {}
+        chamber = self.chamber
+        flags = result.flags
+
+        for index, item in enumerate(lists):
+            kind, value = self._parse(item)
+            if kind == 'w':
+                result.elapsed += value
+                continue
+            if kind == '':
+                continue
+
+            result.actuations += 1
+            result.elapsed += self.switch_ms
+            node = self.node_of.get(value)
+            if node is None:
+                flags.append((index, item, 'unknown', 'There is no valve %s in the processor' % value))
+                continue
+
+            if kind == 'o':
+                if node in content:
+                    flags.append((index, item, 'already open', 'The valve %s is already open' % value))
+                    continue
+                if value in self.blocked:
+                    flags.append((index, item, 'blocked', 'The valve %s should be avoided' % value))
+                found = self._path(node, content)
+                if found is None:
+                    flags.append((index, item, 'no path', 'The valve %s has no path to a reservoir' % value))
+                    content[node] = None
+                    continue
+                path, reservoir = found
+                if paths:
+                    result.paths[index] = path
+                if reservoir in result.volumes:
+                    if result.volumes[reservoir] < chamber:
+                        flags.append((index, item, 'empty', 'The reservoir %s is empty' % reservoir))
+                    result.volumes[reservoir] -= chamber
+                result.drawn[reservoir] = result.drawn.get(reservoir, 0) + chamber
+                for i in range(len(path) - 1):
+                    content[path[i]] = content[path[i + 1]]
+                content[path[-1]] = reservoir
+
+            else:
+                if node not in content:
+                    flags.append((index, item, 'already closed', 'The valve %s is already closed' % value))
+                    continue
+                found = self._path(node, content)
+                if found is None:
+                    flags.append((index, item, 'trapped', 'The fluid of the valve %s has no path to a reservoir' % value))
+                    del content[node]
+                    continue
+                path, reservoir = found
+                if paths:
+                    result.paths[index] = path
+                source = content[path[-1]]
+                if source is not None:
+                    received = result.received.setdefault(reservoir, {})
+                    received[source] = received.get(source, 0) + chamber
+                    if reservoir in result.volumes:
+                        result.volumes[reservoir] += chamber
+                for i in range(len(path) - 1, 0, -1):
+                    content[path[i]] = content[path[i - 1]]
+                del content[node]
+
+        for node in content:
+            flags.append((len(lists), '', 'left open', 'The valve %s is open at the end' % self.name_at[node]))
+        result.chambers = {self.name_at[node]: source for node, source in content.items()}
+        return result
+
+
+def check_transfer(result, inputs, output):
+    '''Flags a simulated transfer whose output did not receive the inputs in their ratios'''
+    net = result.net(output)
+    expected = {str(name): value for name, value in inputs.items()}
+    if net and expected:
+        scale = sum(net.values()) / sum(expected.values())
+        if any(abs(net.get(name, 0) - value * scale) > 1e-9 for name, value in expected.items()) or set(net) - set(expected):
+            result.flags.append((None, '', 'ratio', 'The output %s received %s instead of %s' % (output, net, expected)))
+    return result
+
+
+def _start_worker(my_processor, blocked, chamber, switch_ms):
+    global _simulator
+    _simulator = Simulator(my_processor, blocked, chamber, switch_ms)
+
+
+def _simulate(lists):
+    return _simulator.run(lists)
+
+
+def simulate_batch(my_processor, methods, blocked=(), workers=1, chamber=1.0, switch_ms=0, chunksize=64):
+    '''Simulates many methods (lists of commands); returns their Simulations in order'''
+    if workers == 1:
+        simulator = Simulator(my_processor, blocked, chamber, switch_ms)
+        return [simulator.run(lists) for lists in methods]
+    with multiprocessing.Pool(workers or os.cpu_count(), initializer=_start_worker,
+                              initargs=(my_processor, blocked, chamber, switch_ms)) as pool:
+        return pool.map(_simulate, methods, chunksize)
+
+
+def main(argv=None):
+    from fluidic_planner import load_processor
+    from routines import read_method, read_routine
+    parser = argparse.ArgumentParser(description='Simulates routines (.py) and methods (.txt) without the board')
+    parser.add_argument('files', nargs='+', help='routine or method files')
+    parser.add_argument('--chip', default='Processor_info', help='folder with the processor information')
+    parser.add_argument('--avoid', nargs='*', default=[], help='valves that should not be opened')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes')
+    parser.add_argument('--verbose', action='store_true', help='prints every flag')
+    args = parser.parse_args(argv)
+
+    my_processor = load_processor(args.chip)
+    methods = [read_routine(path) if path.endswith('.py') else read_method(path) for path in args.files]
+    results = simulate_batch(my_processor, methods, args.avoid, args.workers)
+
+    invalid = 0
+    for path, result in zip(args.files, results):
+        invalid += not result.valid
+        received = '; '.join('%s: %s' % (reservoir, ', '.join('%s %g' % item for item in sorted(result.net(reservoir).items())))
+                             for reservoir in sorted(result.received) if any(volume > 0 for volume in result.net(reservoir).values()))
+        print('%-40s %-7s %10.1f s %6i actuations %3i flags  %s' % (os.path.basename(path), 'ok' if result.valid else 'INVALID',
+                                                                    result.elapsed / 1000, result.actuations, len(result.flags), received))
+        if args.verbose or not result.valid:
+            for index, command, kind, message in result.flags:
+                print('    %s: %s' % (kind, message))
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
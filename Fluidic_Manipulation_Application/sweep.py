@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Planning of parameter sweeps in several processes
+
+All the combinations of inputs, ratios, outputs and avoided valves of a
+processor are planned in a pool of processes. The processor is loaded once, and
+its compiled grid is sent once to each process when the pool starts; each
+process then plans its own blocks of transfers with its own Planner, so nothing
+is shared while planning. The results are written, in the order of the sweep,
+to a JSON lines file as they arrive:
+    {"index": 0, "inputs": {"A": 1}, "output": "B", "avoid": [], "wait": 300,
+     "ok": true, "steps": 12, "valves": 5, "duration": 3600, "routine": [...]}
+and the transfers that cannot be planned have "ok": false and the "error".
+
+usage: python sweep.py --chip Processor_info --out sweep.jsonl --max-inputs 2 --ratios 1 2 --avoid-single --workers 8
+       python sweep.py --chip Processor_info --grid array --metric fluidic
+
+"""
+#import the necessary libraries
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from fluidic_planner import Planner, PlanningError, load_processor, load_pins
+from catalogue import summarize
+
+#planner of each process of the pool
+_planner = None
+
+
+def sweep_specs(my_processor, max_inputs=1, ratios=(1,), outputs=None, avoid_sets=((),), wait=300):
+    '''Returns, one by one, all the transfers (inputs, output, avoid_valves, wait) with
+    up to max_inputs inputs, each one with one of the ratios, to each output'''
+    reservoirs = sorted(my_processor.reservoirs)
+    if outputs is None:
+        outputs = reservoirs
+    for output in outputs:
+        others = [name for name in reservoirs if name != output]
+        for size in range(1, max_inputs + 1):
+            for names in itertools.combinations(others, size):
+                for values in itertools.product(ratios, repeat=size):
+                    for avoid_valves in avoid_sets:
+                        yield dict(zip(names, values)), output, tuple(avoid_valves), wait
+
+
+def single_valve_sets(my_processor):
+    '''Avoided valves of a sweep: none, and each valve of the processor alone'''
+    return [()] + [(name,) for name in my_processor.valves_positioning]
+
+
+def _start_worker(my_processor, pins, grid, metric):
+    global _planner
+    _planner = Planner(None, grid=grid, metric=metric, processor=my_processor, pins=pins)
+
+
+def _plan_block(block):
+    '''Plans a block of (index, spec) in a process and returns its JSON lines
+    and the number of transfers planned'''
+    lines = []
+    planned = 0
+    for index, (inputs, output, avoid_valves, wait) in block:
+        result = {'index': index, 'inputs': inputs, 'output': output, 'avoid': list(avoid_valves), 'wait': wait}
+        try:
+            plan = _planner.transfer(inputs, output, avoid_valves, wait)
+        except PlanningError as error:
+            result.update(ok=False, error=str(error))
+        else:
+            valves, duration = summarize(plan.commands())
+            result.update(ok=True, steps=len(plan.routine), valves=valves, duration=duration, routine=plan.routine)
+            planned += 1
+        lines.append(json.dumps(result))
+    return lines, planned
+
+
+def _blocks(specs, size):
+    numbered = enumerate(specs)
+    while True:
+        block = list(itertools.islice(numbered, size))
+        if not block:
+            return
+        yield block
+
+
+def run_sweep(folder, specs, out, workers=None, block=64, grid='dict', metric='manhattan'):
+    '''Plans the transfers of a sweep in a pool of processes and writes the results
+    to a JSON lines file; returns the number of transfers planned and failed'''
+    my_processor = load_processor(folder)
+    pins = load_pins(folder)
+    workers = workers or os.cpu_count() or 1
+
+    planned = failed = 0
+    with open(out, 'w') as output_file:
+        if workers == 1:
+            _start_worker(my_processor, pins, grid, metric)
+            results = map(_plan_block, _blocks(specs, block))
+            pool = None
+        else:
+            pool = multiprocessing.Pool(workers, initializer=_start_worker, initargs=(my_processor, pins, grid, metric))
+            results = pool.imap(_plan_block, _blocks(specs, block))
+        try:
+            for lines, count in results:
+                output_file.write('\n'.join(lines) + '\n')
+                planned += count
+                failed += len(lines) - count
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    return planned, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plans all the combinations of inputs, ratios, outputs and avoided valves')
+    parser.add_argument('--chip', default='Processor_info', help='folder with the processor information')
+    parser.add_argument('--out', default='sweep.jsonl', help='JSON lines file where the results are saved')
+    parser.add_argument('--max-inputs', type=int, default=1, help='largest number of inputs of a transfer')
+    parser.add_argument('--ratios', type=int, nargs='+', default=[1], help='number of valves of each input')
+    parser.add_argument('--outputs', nargs='+', help='output reservoirs (all by default)')
+    parser.add_argument('--avoid-single', action='store_true', help='also plans each transfer avoiding each valve')
+    parser.add_argument('--wait', type=int, default=300, help='waiting time between operations (ms)')
+    parser.add_argument('--workers', type=int, help='number of processes (one per core by default)')
+    parser.add_argument('--block', type=int, default=64, help='transfers sent to a process at a time')
+    parser.add_argument('--grid', default='dict', choices=['dict', 'array'], help='grid used by the planner')
+    parser.add_argument('--metric', default='manhattan', choices=['manhattan', 'fluidic'],
+                        help='distance used to grow the groups of valves (fluidic needs --grid array)')
+    args = parser.parse_args(argv)
+    if args.metric != 'manhattan' and args.grid != 'array':
+        parser.error('--metric %s needs --grid array' % args.metric)
+
+    my_processor = load_processor(args.chip)
+    avoid_sets = single_valve_sets(my_processor) if args.avoid_single else [()]
+    specs = sweep_specs(my_processor, args.max_inputs, args.ratios, args.outputs, avoid_sets, args.wait)
+
+    start = time.perf_counter()
+    planned, failed = run_sweep(args.chip, specs, args.out, args.workers, args.block, args.grid, args.metric)
+    elapsed = time.perf_counter() - start
+    rate = (planned + failed) / elapsed if elapsed > 0 else 0.0
+    print('%i transfers planned, %i failed in %.3f s (%.0f transfers/s)' % (planned, failed, elapsed, rate))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Generator of synthetic processors with N x N valves
+
+It writes a Processor_info folder (size.txt, walls.txt, reservoirs.txt,
+perimeter_valves.txt, valves_positioning.txt and Arduino_pins.txt) with the same
+layout as the processors shipped with the application: the valves in the center,
+one perimeter valve next to each border valve, one reservoir after each
+perimeter valve and walls in the corners.
+
+The pins are numbered in sequence and only make sense with a mocked board,
+since an Arduino Mega has 54 digital pins.
+
+usage: python synthetic_chip.py 32 Processor_info_32x32
+
+"""
+#import the necessary libraries
+import argparse
+import os
+import pprint
+
+
+def reservoir_name(i):
+    '''Names the reservoirs A, B, ... Z, AA, AB...'''
+    name = ''
+    i = i + 1
+    while i > 0:
+        i, remainder = divmod(i - 1, 26)
+        name = chr(ord('A') + remainder) + name
+    return name
+
+
+def chip_definition(n):
+    '''Returns the dictionaries / lists of a processor with n x n valves'''
+    size = n + 4
+    first, last = 2, n + 1
+
+    #valves of the processor, numbered row by row
+    valves_positioning = {}
+    number = 1
+    for y in range(first, last + 1):
+        for x in range(first, last + 1):
+            valves_positioning[str(number)] = (x, y)
+            number += 1
+
+    #perimeter valves and reservoirs, clockwise from the top left corner
+    border = [(x, first - 1, x, first - 2) for x in range(first, last + 1)]
+    border += [(last + 1, y, last + 2, y) for y in range(first, last + 1)]
+    border += [(x, last + 1, x, last + 2) for x in range(last, first - 1, -1)]
+    border += [(first - 1, y, first - 2, y) for y in range(last, first - 1, -1)]
+
+    perimeter_valves = {}
+    reservoirs = {}
+    for i, (px, py, rx, ry) in enumerate(border):
+        perimeter_valves[str(number)] = (px, py)
+        reservoirs[reservoir_name(i)] = (rx, ry)
+        number += 1
+
+    #the 2 x 2 corners of the grid do not codify a valve
+    walls = []
+    for cx in (0, size - 2):
+        for cy in (0, size - 2):
+            walls.extend([(cx, cy), (cx + 1, cy), (cx, cy + 1), (cx + 1, cy + 1)])
+
+    pins = {str(i): i + 1 for i in range(1, number)}
+
+    return {'size.txt': (size, size), 'walls.txt': walls, 'reservoirs.txt': reservoirs,
+            'perimeter_valves.txt': perimeter_valves, 'valves_positioning.txt': valves_positioning,
+            'Arduino_pins.txt': pins}
+
+
+def generate_chip(n, folder):
+    '''Writes a processor with n x n valves in a folder and returns the folder'''
+    os.makedirs(folder, exist_ok=True)
+    for name, value in chip_definition(n).items():
+        with open(os.path.join(folder, name), 'w') as file:
+            if name == 'size.txt':
+                file.write('%i,%i' % value)
+            else:
+                file.write(pprint.pformat(value, sort_dicts=False))
+    return folder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Writes a synthetic processor with N x N valves')
+    parser.add_argument('n', type=int, help='number of valves in each side of the processor')
+    parser.add_argument('folder', help='folder where the processor information is saved')
+    args = parser.parse_args(argv)
+    generate_chip(args.n, args.folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Timing of the valves switched while a method runs
+
+For every valve switched by MethodExecutor, Telemetry records when it should
+have been switched (planned: the start of the method plus the waits before it,
+plus the time paused) and when the board was written (actual), both from
+time.monotonic(). The actuations are kept in a ring buffer of fixed size that
+is flushed to a log file when it is full and when the method ends, so a long
+method does not grow the memory and nothing is lost. The log is a text file with
+one line per actuation:
+    step pin value planned_us actual_us
+with the times in microseconds since the start of the method, after a header
+line (# telemetry {...}) and followed by a summary line (# summary {...}).
+
+The summary counts the actuations in two histograms:
+    latency  actual - planned time of each step (how late the valves switched)
+    jitter   difference between the actual and the planned time between two
+             consecutive steps (how regular the steps were)
+A stall of the computer shows as a jump of the latency of all the actuations
+after it, and as a single large jitter.
+
+usage: python telemetry.py run.log (prints the summary of a log)
+
+"""
+#import the necessary libraries
+import bisect
+import itertools
+import json
+import sys
+import time
+from collections import deque
+
+#upper limits (ms) of the buckets of the histograms; the last bucket has no limit
+BUCKETS = (0.01, 0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+
+#Histogram of times in BUCKETS
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.largest = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.largest:
+            self.largest = ms
+
+    def percentile(self, fraction):
+        '''Returns the upper limit of the bucket of a percentile (ms); None beyond the last limit'''
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS[index] if index < len(BUCKETS) else None
+        return None
+
+    def summary(self):
+        return {'count': self.count, 'mean_ms': self.total / self.count if self.count else 0.0,
+                'max_ms': self.largest, 'p50_ms': self.percentile(0.5), 'p99_ms': self.percentile(0.99),
+                'buckets': [['<=%g' % limit for limit in BUCKETS] + ['>%g' % BUCKETS[-1]], self.counts]}
+
+    def text(self, width=40):
+        '''Returns the histogram as lines of text'''
+        labels = ['<= %g ms' % limit for limit in BUCKETS] + ['> %g ms' % BUCKETS[-1]]
+        largest = max(self.counts) or 1
+        return '\n'.join('%12s %8i %s' % (label, count, '#' * int(round(width * count / largest)))
+                         for label, count in zip(labels, self.counts) if count)
+
+
+#Planned and actual times of the actuations of a method
+class Telemetry:
+    def __init__(self, path=None, capacity=4096, labels=None):
+        #log file; without it, the oldest actuations are dropped when the buffer is full
+        self.path = path
+        self.buffer = deque(maxlen=capacity)
+        self.capacity = capacity
+        self.labels = dict(labels or {})
+        self.latency = Histogram()
+        self.jitter = Histogram()
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.start = None
+        self._last = None
+        self._file = None
+
+    def begin(self, start=None):
+        '''Starts a run; the times are measured from start (time.monotonic())'''
+        self.start = time.monotonic() if start is None else start
+        if self.path is not None:
+            self._file = open(self.path, 'w')
+            header = dict(self.labels, started=time.time(), capacity=self.capacity)
+            self._file.write('# telemetry %s\n' % json.dumps(header, sort_keys=True))
+
+    def record(self, step, changes, planned, actual):
+        '''Records the pins {pin: value} switched in a step, planned and actually at two
+        times of time.monotonic()'''
+        self.latency.add(max(actual - planned, 0.0) * 1000)
+        if self._last is not None:
+            self.jitter.add(abs((actual - self._last[1]) - (planned - self._last[0])) * 1000)
+        self._last = (planned, actual)
+
+        planned_us = int((planned - self.start) * 1000000)
+        actual_us = int((actual - self.start) * 1000000)
+        for pin, value in changes.items():
+            if len(self.buffer) == self.capacity:
+                if self._file is not None:
+                    self.flush()
+                else:
+                    self.dropped += 1
+            self.buffer.append((step, pin, value, planned_us, actual_us))
+            self.recorded += 1
+
+    def flush(self):
+        '''Writes the actuations in the buffer to the log'''
+        if self._file is None:
+            return
+        self._file.write(''.join('%i %s %i %i %i\n' % entry for entry in self.buffer))
+        self.flushed += len(self.buffer)
+        self.buffer.clear()
+
+    def summary(self):
+        return {'labels': dict(self.labels), 'actuations': self.recorded, 'dropped': self.dropped,
+                'latency': self.latency.summary(), 'jitter': self.jitter.summary()}
+
+    def close(self):
+        '''Flushes the buffer and writes the summary to the log'''
+        if self._file is None:
+            return
+        self.flush()
+        self._file.write('# summary %s\n' % json.dumps(self.summary(), sort_keys=True))
+        self._file.close()
+        self._file = None
+
+
+def read_log(path):
+    '''Returns the header, the actuations (step, pin, value, planned_us, actual_us) and
+    the summary of a log'''
+    header = summary = None
+    actuations = []
+    with open(path, 'r') as inf:
+        for line in inf:
+            if line.startswith('# telemetry '):
+                header = json.loads(line[len('# telemetry '):])
+            elif line.startswith('# summary '):
+                summary = json.loads(line[len('# summary '):])
+            elif line.strip():
+                step, pin, value, planned_us, actual_us = line.split()
+                actuations.append((int(step), pin, int(value), int(planned_us), int(actual_us)))
+    return header, actuations, summary
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print('usage: python telemetry.py run.log')
+        return 2
+    header, actuations, summary = read_log(argv[0])
+    #the histograms are rebuilt from the actuations, so a log cut by a crash can also be read
+    telemetry = Telemetry()
+    telemetry.start = 0
+    for step, group in itertools.groupby(actuations, key=lambda actuation: actuation[0]):
+        group = list(group)
+        telemetry.record(step, {pin: value for step, pin, value, planned_us, actual_us in group},
+                         group[0][3] / 1000000, group[0][4] / 1000000)
+    print('%i actuations%s' % (len(actuations), '' if summary is not None else ' (no summary: the run did not end)'))
+    for name, histogram in (('latency', telemetry.latency), ('jitter', telemetry.jitter)):
+        print('%s: mean %.3f ms, max %.3f ms' % (name, histogram.total / histogram.count if histogram.count else 0.0, histogram.largest))
+        print(histogram.text())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
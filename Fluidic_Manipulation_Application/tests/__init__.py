@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the Fluidic Manipulation Application
+
+usage: python -m pytest tests (or python -m unittest discover tests), from the
+Fluidic_Manipulation_Application folder
+
+"""
+#the modules of the application are imported by name, as the scripts do
+import os
+import sys
+
+FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FOLDER not in sys.path:
+    sys.path.insert(0, FOLDER)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of catalogue.py: free names, filters and the files changed by other programs
+
+"""
+#import the necessary libraries
+import os
+import shutil
+import tempfile
+import unittest
+import tests  #puts the application in the path
+from catalogue import Catalogue
+
+
+class TestCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.catalogue = Catalogue(self.folder, '.py')
+
+    def tearDown(self):
+        self.catalogue.close()
+        shutil.rmtree(self.folder)
+
+    def save(self, name, inputs=None, output=None):
+        name = self.catalogue.allocate(name)
+        with open(os.path.join(self.folder, name + '.py'), 'w') as out:
+            out.write('')
+        self.catalogue.add(name, ['o1', 'w300', 'c1'], 'chip', inputs, output)
+        return name
+
+    def test_free_names(self):
+        self.assertEqual([self.save('mix') for i in range(3)], ['mix', 'mix(1)', 'mix(2)'])
+
+    def test_input_filter_matches_whole_names(self):
+        self.save('a', {'A': 1, 'B': 2}, 'C')
+        self.save('b', {'AB': 1}, 'C')
+        self.save('c', {'A_': 1}, 'C')
+        self.assertEqual(self.catalogue.files(input='A'), ['a.py'])
+        self.assertEqual(self.catalogue.files(input='A_'), ['c.py'])
+        #wildcards of LIKE are not wildcards here
+        self.assertEqual(self.catalogue.files(input='%'), [])
+        self.assertEqual(self.catalogue.files(input='_'), [])
+        self.assertEqual(self.catalogue.files(input='B', output='C'), ['a.py'])
+
+    def test_rescan_finds_files_of_other_programs(self):
+        self.save('mix')
+        with open(os.path.join(self.folder, 'other.py'), 'w') as out:
+            out.write('')
+        os.remove(os.path.join(self.folder, 'mix.py'))
+        #the folder is listed again when its modification time changes
+        os.utime(self.folder, ns=(0, os.stat(self.folder).st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.catalogue.files(), ['other.py'])
+        self.assertEqual(self.catalogue.allocate('mix'), 'mix')
+
+    def test_database_can_be_deleted(self):
+        self.save('mix')
+        self.catalogue.close()
+        os.remove(os.path.join(self.folder, '.catalogue.sqlite'))
+        self.catalogue = Catalogue(self.folder, '.py')
+        self.assertEqual(self.catalogue.files(), ['mix.py'])
+        self.assertEqual(self.catalogue.allocate('mix'), 'mix(1)')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of checkpoint.py: a method aborted in the middle continues from its checkpoint
+and sets the valves as the method does without stopping
+
+"""
+#import the necessary libraries
+import os
+import tempfile
+import unittest
+from tests import FOLDER
+from tests.test_execution import Connection, board_with
+from checkpoint import Checkpoint, CheckpointError, checkpoint_path, load_checkpoint, resume_executor
+from execution import MethodExecutor
+from fluidic_planner import load_chip
+from method_format import chip_hash, compiled_path, load_compiled, write_compiled
+from routines import TextMethod
+
+METHOD = 'o1 w300 o2 w300 c1 w300 o12 w300 o11 w300 c2 w300 c12 w300 c11 w300'
+
+
+#sleep of an executor that aborts it at one of its waits
+class AbortAt:
+    def __init__(self, count):
+        self.count = count
+        self.executor = None
+
+    def __call__(self, seconds):
+        self.count -= 1
+        if self.count == 0:
+            self.executor.abort()
+
+
+def events(executor):
+    return [event[0] for event in executor.events.queue]
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.processor, self.pins = load_chip(os.path.join(FOLDER, 'Processor_info'))
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.method = os.path.join(folder.name, 'method.txt')
+        with open(self.method, 'w') as out:
+            out.write(METHOD)
+        self.path = checkpoint_path(self.method)
+
+    def run_without_stopping(self):
+        board = board_with(self.pins)
+        executor = MethodExecutor(METHOD.split(), self.pins, connection=Connection(board), log=None, sleep=lambda seconds: None)
+        executor.run()
+        return board.written
+
+    def abort(self, lists, compiled=False):
+        '''Runs a method until its fourth wait and returns the checkpoint saved'''
+        board = board_with(self.pins)
+        sleep = AbortAt(4)
+        executor = MethodExecutor(lists, self.pins, connection=Connection(board), log=None, sleep=sleep,
+                                  checkpoint=Checkpoint(self.path, compiled_path(self.method) if compiled else self.method, compiled))
+        sleep.executor = executor
+        executor.run()
+        self.assertEqual(events(executor)[-1], 'aborted')
+        #the valves are closed when the method is aborted
+        self.assertTrue(all(value == 0 for pin, value in board.written[-len(self.pins):]))
+        return load_checkpoint(self.path)
+
+    def test_resume(self):
+        data = self.abort(TextMethod(self.method, self.pins))
+        self.assertEqual(data['state'], 'aborted')
+        #o1 w300 o2 w300 c1 w300 o12 were done; the wait after o12 is waited again
+        self.assertEqual(data['step'], 7)
+        self.assertEqual(data['valves'], sorted([[self.pins['1'], 0], [self.pins['2'], 1], [self.pins['12'], 1]]))
+
+        board = board_with(self.pins)
+        executor = resume_executor(self.path, self.pins, connection=Connection(board), log=None, sleep=lambda seconds: None)
+        executor.run()
+        self.assertEqual(events(executor)[-1], 'finished')
+        self.assertFalse(os.path.exists(self.path))
+
+        #the valves are set as they were, and then as in the rest of the method
+        restored = {pin: value for pin, value in board.written[:len(self.pins)]}
+        self.assertEqual(restored, {pin: 1 if pin in (self.pins['2'], self.pins['12']) else 0 for pin in self.pins.values()})
+        self.assertEqual(board.written[len(self.pins):], self.run_without_stopping()[4:])
+
+    def test_resume_compiled(self):
+        digest = chip_hash(self.processor.model, self.pins)
+        write_compiled(compiled_path(self.method), METHOD.split(), self.pins, digest)
+        data = self.abort(load_compiled(compiled_path(self.method), digest), compiled=True)
+        self.assertTrue(data['compiled'])
+
+        board = board_with(self.pins)
+        executor = resume_executor(self.path, self.pins, digest, connection=Connection(board), log=None, sleep=lambda seconds: None)
+        executor.run()
+        self.assertEqual(events(executor)[-1], 'finished')
+        self.assertEqual(board.written[len(self.pins):], self.run_without_stopping()[4:])
+
+    def test_method_changed(self):
+        self.abort(TextMethod(self.method, self.pins))
+        with open(self.method, 'a') as out:
+            out.write('o1 w300 c1 w300')
+        with self.assertRaises(CheckpointError):
+            resume_executor(self.path, self.pins, log=None)
+
+    def test_unreadable_checkpoint(self):
+        with open(self.path, 'w') as out:
+            out.write('{"method": ')
+        with self.assertRaises(CheckpointError):
+            load_checkpoint(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
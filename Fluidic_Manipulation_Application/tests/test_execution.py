@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of execution.py with a board that only records what is written to it
+
+"""
+#import the necessary libraries
+import os
+import tempfile
+import unittest
+from tests import FOLDER
+from execution import MethodExecutor, PinError, missing_pins
+from fluidic_planner import load_pins
+from routines import TextMethod
+
+
+#Pin of a board that records the values written to it
+class Pin:
+    def __init__(self, number, written):
+        self.number = number
+        self.written = written
+
+    def write(self, value):
+        self.written.append((self.number, value))
+
+
+#Board with the pins of a processor
+class Board:
+    def __init__(self):
+        self.written = []
+        self.digital = {}
+
+
+#BoardConnection that always gives the same board
+class Connection:
+    def __init__(self, board):
+        self.board = board
+
+    def connect(self):
+        return self.board
+
+    def is_alive(self):
+        return True
+
+
+def board_with(pins):
+    board = Board()
+    board.digital = {pin: Pin(pin, board.written) for pin in pins.values()}
+    return board
+
+
+class TestPins(unittest.TestCase):
+    def setUp(self):
+        #valves 13, 14, 15, 18, 19 and 21 of this processor have no pin
+        self.pins = load_pins(os.path.join(FOLDER, 'Processor_info_3x3'))
+
+    def test_missing_pins(self):
+        self.assertEqual(missing_pins('o1 w300 o21 w300 c13 c1'.split(), self.pins), ['13', '21'])
+
+    def test_method_without_pins_is_not_started(self):
+        board = board_with(self.pins)
+        lists = 'o1 w0 o2 w0 o13 w0 c13 c2 c1'.split()
+        with self.assertRaises(PinError) as raised:
+            MethodExecutor(lists, self.pins, connection=Connection(board), log=None)
+        self.assertIn('13', str(raised.exception))
+        self.assertEqual(board.written, [])
+
+    def test_method_file_without_pins_is_not_started(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'method.txt')
+            with open(path, 'w') as out:
+                out.write('o1 w0 o18 w0 c18 c1 ')
+            with self.assertRaises(PinError) as raised:
+                MethodExecutor(TextMethod(path, self.pins), self.pins, log=None)
+            self.assertIn('18', str(raised.exception))
+
+    def test_method_runs(self):
+        board = board_with(self.pins)
+        executor = MethodExecutor('o1 w0 o2 w0 c2 c1'.split(), self.pins, connection=Connection(board), log=None)
+        executor.start()
+        executor.join()
+        self.assertEqual(list(executor.events.queue)[-1][0], 'finished')
+        self.assertEqual(board.written, [(self.pins['1'], 1), (self.pins['2'], 1), (self.pins['2'], 0), (self.pins['1'], 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
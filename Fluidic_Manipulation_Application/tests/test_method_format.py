@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of method_format.py: the compiled copy of a method gives the same actions as
+the text, and the files that cannot be used are refused
+
+"""
+#import the necessary libraries
+import os
+import tempfile
+import unittest
+from tests import FOLDER
+from execution import parse_actions
+from fluidic_planner import load_chip
+from method_format import HEADER, RECORD, MethodFormatError, chip_hash, compiled_path, load_compiled, write_compiled
+
+
+class TestCompiledMethod(unittest.TestCase):
+    def setUp(self):
+        self.processor, self.pins = load_chip(os.path.join(FOLDER, 'Processor_info'))
+        self.digest = chip_hash(self.processor.model, self.pins)
+        self.lists = 'o1 w300 o2 w150 c1 w0 o12 w300 c2 c12 w300'.split()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = compiled_path(os.path.join(folder.name, 'method.txt'))
+
+    def test_compiled_path(self):
+        self.assertEqual(compiled_path(os.path.join('Methods', 'mix.txt')), os.path.join('Methods', 'mix.fmb'))
+
+    def test_same_actions_as_the_text(self):
+        write_compiled(self.path, self.lists, self.pins, self.digest)
+        with load_compiled(self.path, self.digest) as method:
+            self.assertEqual(len(method), len(self.lists))
+            compiled = [(kind, value) for kind, value, text in method.actions()]
+        expected = [(kind, value) for kind, value, text in parse_actions(self.lists, self.pins)]
+        self.assertEqual(compiled, expected)
+
+    def test_starts_from_a_record(self):
+        write_compiled(self.path, self.lists, self.pins, self.digest)
+        with load_compiled(self.path) as method:
+            self.assertEqual(list(method.records(4)), list(method.records())[4:])
+
+    def test_valve_without_pin(self):
+        with self.assertRaises(MethodFormatError):
+            write_compiled(self.path, ['o999', 'w300'], self.pins, self.digest)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_another_processor(self):
+        write_compiled(self.path, self.lists, self.pins, self.digest)
+        other = dict(self.pins, **{'1': self.pins['1'] + 100})
+        with self.assertRaises(MethodFormatError) as raised:
+            load_compiled(self.path, chip_hash(self.processor.model, other))
+        self.assertIn('another processor', str(raised.exception))
+
+    def test_truncated_file(self):
+        write_compiled(self.path, self.lists, self.pins, self.digest)
+        with open(self.path, 'rb') as inf:
+            data = inf.read()
+        for size, message in ((len(data) - RECORD.size // 2, 'incomplete'), (HEADER.size - 1, 'not a compiled method'), (0, 'empty')):
+            with open(self.path, 'wb') as out:
+                out.write(data[:size])
+            with self.assertRaises(MethodFormatError) as raised:
+                load_compiled(self.path, self.digest)
+            self.assertIn(message, str(raised.exception))
+
+    def test_not_a_compiled_method(self):
+        write_compiled(self.path, self.lists, self.pins, self.digest)
+        with open(self.path, 'r+b') as out:
+            out.write(b'FMB9')
+        with self.assertRaises(MethodFormatError) as raised:
+            load_compiled(self.path, self.digest)
+        self.assertIn('version', str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of optimizer.py: the optimized methods must open and close every valve at the
+same times or, with parallel steps, be shorter and deliver the same fluids in the
+simulator
+
+"""
+#import the necessary libraries
+import os
+import random
+import unittest
+from tests import FOLDER
+from fluidic_planner import Planner, PlanningError
+from optimizer import equivalent, optimize, runtime, same_fluids, valve_intervals
+from simulator import Simulator
+
+
+def commands(text):
+    return text.split()
+
+
+class TestOptimizer(unittest.TestCase):
+    def test_merges_waits(self):
+        lists = commands('o1 w300 w200 c1 w300')
+        optimized = optimize(lists)
+        self.assertEqual(optimized, commands('o1 w500 c1 w300'))
+        self.assertEqual(runtime(optimized), runtime(lists))
+        self.assertTrue(equivalent(lists, optimized))
+
+    def test_keeps_the_wait_of_redundant_steps(self):
+        lists = commands('o1 w300 o1 w300 c1 w300')
+        optimized = optimize(lists, allow_transients=True)
+        self.assertEqual(optimized, commands('o1 w600 c1 w300'))
+        self.assertTrue(equivalent(lists, optimized))
+
+    def test_keeps_pump_cycles(self):
+        lists = commands('o1 w300 c1 w300 o1 w300 c1 w300')
+        for allow_transients in (False, True):
+            self.assertEqual(optimize(lists, allow_transients=allow_transients), lists)
+        #removing a cycle is not equivalent, with or without transients
+        for allow_transients in (False, True):
+            self.assertFalse(equivalent(lists, commands('o1 w300 c1 w300'), allow_transients))
+
+    def test_cancels_pairs_without_a_wait(self):
+        lists = commands('o1 w300 c1 w0 o1 w300 c1 w300')
+        optimized = optimize(lists, allow_transients=True)
+        self.assertEqual(optimized, commands('o1 w600 c1 w300'))
+        self.assertTrue(equivalent(lists, optimized, allow_transients=True))
+        self.assertFalse(equivalent(lists, optimized))
+        #without transients only the empty wait is removed
+        self.assertEqual(optimize(lists), commands('o1 w300 c1 o1 w300 c1 w300'))
+        self.assertTrue(equivalent(lists, optimize(lists)))
+
+    def test_intervals(self):
+        self.assertEqual(valve_intervals(commands('o1 w300 o2 c1 w100')), {'1': [(0, 300)], '2': [(300, None)]})
+        self.assertNotEqual(valve_intervals(commands('o1 w300 c1 w300')), valve_intervals(commands('o1 w600 c1')))
+
+
+class TestOptimizedMethods(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.planner = Planner(os.path.join(FOLDER, 'Processor_info'))
+        cls.processor = cls.planner.processor
+        reservoirs = list(cls.processor.reservoirs)
+        rnd = random.Random(0)
+        cls.routines = []
+        while len(cls.routines) < 40:
+            output, *inputs = rnd.sample(reservoirs, 3)
+            try:
+                plan = cls.planner.transfer({inputs[0]: 1, inputs[1]: rnd.randint(1, 2)}, output, [], 300)
+            except PlanningError:
+                continue
+            cls.routines.append(plan.commands())
+
+    def test_methods_are_shorter_and_deliver_the_same_fluids(self):
+        simulator = Simulator(self.processor)
+        rnd = random.Random(1)
+        for i in range(100):
+            lists = [item for routine in rnd.sample(self.routines, 4) for item in routine]
+            optimized = optimize(lists, self.processor, parallel=True)
+            self.assertLess(runtime(optimized), runtime(lists))
+            self.assertTrue(same_fluids(lists, optimized, self.processor))
+            original, result = simulator.run(lists), simulator.run(optimized)
+            self.assertEqual((original.received, original.drawn), (result.received, result.drawn))
+
+    def test_redundant_commands_are_removed(self):
+        simulator = Simulator(self.processor)
+        for routine in self.routines[:10]:
+            #the first valve of the routine is opened twice
+            lists = routine[:2] + routine[:2] + routine[2:]
+            optimized = optimize(lists)
+            self.assertEqual(optimized[:2], [routine[0], 'w600'])
+            self.assertEqual(len(optimized), len(routine))
+            self.assertTrue(equivalent(lists, optimized))
+            self.assertEqual(simulator.run(optimized).received, simulator.run(routine).received)
+
+    def test_valves_that_affect_each_other_are_not_switched_together(self):
+        #the first two valves of a routine: the perimeter valve of an input and its neighbor
+        routine = self.routines[0]
+        self.assertEqual(optimize(routine[:4], self.processor, parallel=True), routine[:4])
+        together = [routine[0], routine[2], routine[3]]
+        self.assertFalse(same_fluids(routine[:4], together, self.processor))
+
+    def test_keeps_the_valves_where_routines_meet(self):
+        planner = self.planner
+        first = planner.transfer({'D': 1, 'F': 1}, 'C', [], 300).commands()
+        second = planner.transfer({'C': 1, 'E': 1}, 'A', [], 300).commands()
+        #the output of the first routine is closed and then opened by the second one
+        self.assertEqual(first[-2][1:], second[0][1:])
+        lists = first + second
+        for allow_transients in (False, True):
+            self.assertEqual(optimize(lists, allow_transients=allow_transients), lists)
+        #keeping it open would send the end of the mixture to the next output
+        self.assertFalse(same_fluids(lists, first[:-2] + second[2:], self.processor))
+
+
+if __name__ == '__main__':
+    unittest.main()
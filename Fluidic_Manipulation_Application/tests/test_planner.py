@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of fluidic_planner.py: routines of the processors of the repository, the
+grids and searches that must give the same routines, the order of the valves
+closed and the cache of the processors
+
+"""
+#import the necessary libraries
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+from tests import FOLDER
+from fluidic_planner import Planner, PlanningError, cache_path, checking_closing, load_chip
+from synthetic_chip import generate_chip
+
+#routines planned by the original planner: (processor, inputs, output, avoided valves, commands)
+ROUTINES = [
+    ('Processor_info', {'D': 1, 'F': 1}, 'C', (),
+     'o4 w300 o5 w300 c4 w300 o7 w300 o8 w300 c7 w300 o3 w300 o2 w300 c8 w300 c5 w300 c2 w300 c3 w300'),
+    ('Processor_info', {'E': 1, 'G': 1, 'D': 1}, 'A', (),
+     'o6 w300 o5 w300 c6 w300 o9 w300 o8 w300 c9 w300 o4 w300 o2 w300 c4 w300 o12 w300 o11 w300 c2 w300 c5 w300 c8 w300 '
+     'c11 w300 c12 w300'),
+    ('Processor_info_3x3', {'G': 1, 'A': 2}, 'C', (),
+     'o8 w300 o7 w300 c8 w300 o19 w300 o18 w300 o21 w300 c19 w300 o1 w300 o2 w300 o4 w300 c7 w300 c4 w300 c18 w300 '
+     'c21 w300 c2 w300 c1 w300'),
+    ('Processor_info_3x3', {'I': 1, 'B': 1}, 'C', (11, 7),
+     'o12 w300 o13 w300 c12 w300 o20 w300 o21 w300 c20 w300 o1 w300 o2 w300 o18 w300 o15 w300 c13 w300 c15 w300 '
+     'c18 w300 c21 w300 c2 w300 c1 w300'),
+    ('Processor_info_4x4', {'O': 1, 'I': 2}, 'B', (4,),
+     'o25 w300 o26 w300 c25 w300 o13 w300 o12 w300 o14 w300 c13 w300 o31 w300 o30 w300 o28 w300 o22 w300 o20 w300 '
+     'o18 w300 c12 w300 c14 w300 c18 w300 c20 w300 c22 w300 c26 w300 c28 w300 c30 w300 c31 w300'),
+    ('Processor_info_4x4', {'C': 3, 'I': 2}, 'N', (),
+     'o13 w300 o12 w300 o14 w300 c13 w300 o1 w300 o2 w300 o8 w300 o32 w300 c1 w300 o23 w300 o22 w300 o26 w300 '
+     'o16 w300 c12 w300 c14 w300 c16 w300 c2 w300 c8 w300 c32 w300 c26 w300 c22 w300 c23 w300'),
+]
+
+
+def random_transfers(my_processor, count, seed=1):
+    '''Transfers (inputs, output, avoided valves) between the reservoirs of a processor'''
+    rnd = random.Random(seed)
+    reservoirs = sorted(my_processor.reservoirs)
+    valves = sorted(my_processor.valves_positioning, key=int)
+    transfers = []
+    for _ in range(count):
+        names = rnd.sample(reservoirs, rnd.randint(2, 4))
+        avoid_valves = tuple(int(valve) for valve in rnd.sample(valves, rnd.randint(0, len(valves) // 4)))
+        inputs = {name: rnd.randint(1, 2) for name in names[1:]}
+        transfers.append((inputs, names[0], avoid_valves))
+    return transfers
+
+
+def can_close(my_processor, closing):
+    '''True when every valve is a neighbor of a valve still open when it is closed'''
+    for i, node in enumerate(closing[:-1]):
+        if not set(my_processor.neighbors(node)) & set(closing[i + 1:]):
+            return False
+    return True
+
+
+class TestRoutines(unittest.TestCase):
+    def test_routines_of_the_original_planner(self):
+        planners = {}
+        for chip, inputs, output, avoid_valves, expected in ROUTINES:
+            if chip not in planners:
+                planners[chip] = Planner(os.path.join(FOLDER, chip))
+            plan = planners[chip].transfer(inputs, output, avoid_valves, 300)
+            self.assertEqual(' '.join(plan.commands()), expected, (chip, inputs, output))
+
+    def test_grids_give_the_same_routines(self):
+        for chip in ('Processor_info', 'Processor_info_3x3', 'Processor_info_4x4'):
+            folder = os.path.join(FOLDER, chip)
+            planners = [Planner(folder), Planner(folder, grid='array'), Planner(folder, incremental=True)]
+            for inputs, output, avoid_valves in random_transfers(planners[0].processor, 100):
+                routines = []
+                for planner in planners:
+                    try:
+                        routines.append(planner.transfer(inputs, output, avoid_valves, 300).routine)
+                    except PlanningError as error:
+                        routines.append(str(error))
+                self.assertEqual(routines[1], routines[0], (chip, inputs, output, avoid_valves))
+                self.assertEqual(routines[2], routines[0], (chip, inputs, output, avoid_valves))
+
+
+class TestClosing(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.processor = Planner(generate_chip(32, os.path.join(self.folder.name, 'Processor_info_32x32'))).processor
+
+    def test_long_chain(self):
+        #every valve of the processor, in the order a depth first search reaches them
+        start = min(self.processor.model.valve_cells)
+        found = []
+        seen = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            found.append(node)
+            for neighbor in self.processor.neighbors(node):
+                if neighbor in self.processor.model.valve_cells and neighbor not in seen:
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        self.assertGreater(len(found), 1000)
+
+        #the first valve of the search is the one next to the output, closed last
+        closing = found[1:] + found[:1]
+        self.assertFalse(can_close(self.processor, closing))
+        ordered = checking_closing(self.processor, list(closing))
+        self.assertEqual(sorted(ordered), sorted(closing))
+        self.assertEqual(ordered[-1], closing[-1])
+        self.assertTrue(can_close(self.processor, ordered))
+
+    def test_valid_order_is_kept(self):
+        nodes = sorted(self.processor.model.valve_cells)
+        closing = [node for node in nodes if node[1] == nodes[0][1]][::-1]
+        self.assertTrue(can_close(self.processor, closing))
+        self.assertEqual(checking_closing(self.processor, list(closing)), closing)
+
+    def test_isolated_valve(self):
+        nodes = sorted(self.processor.model.valve_cells)
+        with self.assertRaises(PlanningError):
+            checking_closing(self.processor, [nodes[0], nodes[-1]])
+
+
+class TestProcessorCache(unittest.TestCase):
+    def setUp(self):
+        cache = tempfile.TemporaryDirectory()
+        self.addCleanup(cache.cleanup)
+        patch = mock.patch.dict(os.environ, {'FLUIDIC_CACHE_DIR': cache.name})
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.folder = os.path.join(FOLDER, 'Processor_info_3x3')
+
+    def test_cache_is_written(self):
+        processor, pins = load_chip(self.folder)
+        self.assertTrue(os.path.exists(cache_path(self.folder)))
+        cached, cached_pins = load_chip(self.folder)
+        self.assertEqual(cached.model.digest, processor.model.digest)
+        self.assertEqual(cached_pins, pins)
+
+    def test_corrupt_cache(self):
+        processor, pins = load_chip(self.folder, cache=False)
+        for data in (b'', b'not a pickle'):
+            os.makedirs(os.path.dirname(cache_path(self.folder)), exist_ok=True)
+            with open(cache_path(self.folder), 'wb') as out:
+                out.write(data)
+            cached, cached_pins = load_chip(self.folder)
+            self.assertEqual(cached.model.digest, processor.model.digest)
+            self.assertEqual(cached_pins, pins)
+
+
+if __name__ == '__main__':
+    unittest.main()